@@ -0,0 +1,237 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Приближённый расчёт сил тяготения методом Барнса — Хата.
+Квадродерево строится один раз на шаг по кодам Мортона тел, после чего
+все тела-цели обходят дерево одновременно: группа целей спускается в узел
+только если для части из них узел виден под углом больше **theta**.
+Тем же дерево отвечает на запросы ближайшего тела (QuadTree.nearest).
+"""
+
+import numpy as np
+
+from gravity import pair_forces, pair_potential
+
+max_depth = 21
+"""Максимальная глубина дерева (по 21 биту на координату в 64-битном коде Мортона)"""
+
+
+def spread_bits(v):
+    """Раздвигает биты целого числа так, что между ними появляются нулевые биты."""
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+
+class QuadTree:
+    """Квадродерево над телами с координатами **x**, **y** и массами **m**.
+    Узлы хранятся в массивах; тела каждого узла занимают непрерывный
+    отрезок [start, end) в массиве **order**.
+    """
+
+    def __init__(self, x, y, m, leaf_size=8):
+        self.x = x
+        self.y = y
+        self.m = m
+
+        self.x0 = x.min()
+        self.y0 = y.min()
+        self.size = max(x.max() - self.x0, y.max() - self.y0) * (1 + 1e-12) or 1.0
+
+        keys = self.morton_keys(x, y)
+        self.order = np.argsort(keys, kind='stable')
+        keys = self.keys = keys[self.order]
+
+        start, end, level, parent = [0], [len(x)], [0], [-1]
+        corner_x, corner_y = [0], [0]
+        children = [[-1] * 4]
+        i = 0
+        while i < len(start):
+            s, e, l = start[i], end[i], level[i]
+            if e - s > leaf_size and l < max_depth:
+                quadrant = (keys[s:e] >> (2 * (max_depth - l - 1))) & 3
+                bounds = s + np.searchsorted(quadrant, np.arange(5))
+                for q in range(4):
+                    if bounds[q] < bounds[q + 1]:
+                        children[i][q] = len(start)
+                        start.append(int(bounds[q]))
+                        end.append(int(bounds[q + 1]))
+                        level.append(l + 1)
+                        parent.append(i)
+                        corner_x.append(2 * corner_x[i] + (q & 1))
+                        corner_y.append(2 * corner_y[i] + (q >> 1))
+                        children.append([-1] * 4)
+            i += 1
+
+        self.start = np.array(start)
+        self.end = np.array(end)
+        self.level = np.array(level)
+        self.children = np.array(children)
+        self.leaf = (self.children < 0).all(axis=1)
+        self.width = self.size / 2.0 ** self.level
+        self.left = self.x0 + np.array(corner_x) * self.width
+        self.bottom = self.y0 + np.array(corner_y) * self.width
+
+        self.mass, self.com_x, self.com_y = self._moments(np.array(parent))
+
+    def morton_keys(self, x, y):
+        """Коды Мортона точек (x, y); точки вне корня дерева прижимаются к его краю."""
+        cells = 1 << max_depth
+        ix = np.clip(((x - self.x0) / self.size * cells).astype(np.int64), 0, cells - 1)
+        iy = np.clip(((y - self.y0) / self.size * cells).astype(np.int64), 0, cells - 1)
+        return spread_bits(ix) | (spread_bits(iy) << 1)
+
+    def _moments(self, parent):
+        """Массы и центры масс узлов: листья суммируются напрямую, затем снизу вверх."""
+        m = self.m[self.order]
+        mx = m * self.x[self.order]
+        my = m * self.y[self.order]
+
+        mass = np.zeros(len(self.start))
+        moment_x = np.zeros(len(self.start))
+        moment_y = np.zeros(len(self.start))
+
+        leaves = np.flatnonzero(self.leaf)
+        leaves = leaves[np.argsort(self.start[leaves])]
+        mass[leaves] = np.add.reduceat(m, self.start[leaves])
+        moment_x[leaves] = np.add.reduceat(mx, self.start[leaves])
+        moment_y[leaves] = np.add.reduceat(my, self.start[leaves])
+
+        for l in range(self.level.max(), 0, -1):
+            nodes = np.flatnonzero(self.level == l)
+            np.add.at(mass, parent[nodes], mass[nodes])
+            np.add.at(moment_x, parent[nodes], moment_x[nodes])
+            np.add.at(moment_y, parent[nodes], moment_y[nodes])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            com_x = np.where(mass > 0, moment_x / mass, self.left + self.width / 2)
+            com_y = np.where(mass > 0, moment_y / mass, self.bottom + self.width / 2)
+        return mass, com_x, com_y
+
+    def forces(self, targets, theta):
+        """Силы, действующие на тела **targets** (индексы в исходных массивах).
+
+        Параметры:
+
+        **targets** — индексы тел-целей.
+        **theta** — угол раскрытия: узел шириной w на расстоянии d заменяется
+        своим центром масс, если w < theta * d и цель лежит вне узла.
+        """
+        return self._walk(targets, theta, pair_forces, 2)
+
+    def potentials(self, targets, theta):
+        """Потенциальная энергия тел **targets** в поле всех тел; параметры как у forces."""
+        return self._walk(targets, theta, lambda *bodies: (pair_potential(*bodies),), 1)[0]
+
+    def nearest(self, qx, qy, exclude=None):
+        """Номера (в исходных массивах) тел, ближайших к точкам (qx, qy).
+        Из равноудалённых тел выбирается тело с меньшим номером. Тело с номером
+        **exclude**[i] не подходит i-й точке (так ищется ближайший сосед самого
+        тела); если других тел нет, возвращается exclude[i].
+
+        Начальная оценка расстояния — лучшее из соседних по коду Мортона тел,
+        поэтому при обходе каждая точка спускается только в узлы, которые
+        ближе уже найденного тела, и запрос стоит O(log N) на точку.
+        """
+        n = len(self.x)
+        position = np.searchsorted(self.keys, self.morton_keys(qx, qy))
+        candidates = self.order[np.clip(position[:, None] + np.arange(-2, 2), 0, n - 1)]
+        distances = (qx[:, None] - self.x[candidates]) ** 2 + (qy[:, None] - self.y[candidates]) ** 2
+        if exclude is not None:
+            distances[candidates == exclude[:, None]] = np.inf
+        choice = np.argmin(distances, axis=1)
+        rows = np.arange(len(qx))
+        best_index = candidates[rows, choice]
+        best = distances[rows, choice]
+
+        stack = [(0, rows)]
+        while stack:
+            node, group = stack.pop()
+            gx = qx[group]
+            gy = qy[group]
+            left = self.left[node]
+            bottom = self.bottom[node]
+            width = self.width[node]
+            dx = np.maximum(0, np.maximum(left - gx, gx - left - width))
+            dy = np.maximum(0, np.maximum(bottom - gy, gy - bottom - width))
+            # Равенство оставляет в группе точки, у которых в узле может быть равноудалённое тело
+            close = dx * dx + dy * dy <= best[group]
+            if not close.any():
+                continue
+            group = group[close]
+            if self.leaf[node]:
+                bodies = np.sort(self.order[self.start[node]:self.end[node]])
+                distances = (qx[group, None] - self.x[bodies]) ** 2 + (qy[group, None] - self.y[bodies]) ** 2
+                if exclude is not None:
+                    distances[bodies == exclude[group, None]] = np.inf
+                choice = np.argmin(distances, axis=1)
+                found = distances[np.arange(len(group)), choice]
+                found_index = bodies[choice]
+                better = (found < best[group]) | ((found == best[group]) & (found_index < best_index[group]))
+                best[group[better]] = found[better]
+                best_index[group[better]] = found_index[better]
+            else:
+                # Ближайший к группе потомок кладётся в стек последним и обходится первым
+                children = [child for child in self.children[node] if child >= 0]
+                cx = qx[group].mean()
+                cy = qy[group].mean()
+                children.sort(key=lambda child: -np.hypot(self.left[child] + self.width[child] / 2 - cx,
+                                                          self.bottom[child] + self.width[child] / 2 - cy))
+                for child in children:
+                    stack.append((child, group))
+        return best_index
+
+    def _walk(self, targets, theta, kernel, outputs):
+        """Общий обход дерева группами целей. **kernel** имеет сигнатуру pair_forces
+        и возвращает кортеж из **outputs** величин, которые суммируются по источникам.
+        """
+        totals = tuple(np.zeros(len(targets)) for _ in range(outputs))
+        stack = [(0, np.arange(len(targets)))]
+
+        while stack:
+            node, group = stack.pop()
+            if self.mass[node] == 0:
+                continue
+            t = targets[group]
+            tx = self.x[t]
+            ty = self.y[t]
+
+            r = np.hypot(self.com_x[node] - tx, self.com_y[node] - ty)
+            inside = ((tx >= self.left[node]) & (tx <= self.left[node] + self.width[node]) &
+                      (ty >= self.bottom[node]) & (ty <= self.bottom[node] + self.width[node]))
+            far = (self.width[node] < theta * r) & ~inside
+
+            if far.any():
+                values = kernel(tx[far], ty[far], self.m[t[far]],
+                                self.com_x[node], self.com_y[node], self.mass[node])
+                for total, value in zip(totals, values):
+                    total[group[far]] += value
+
+            near = ~far
+            if not near.any():
+                continue
+            group = group[near]
+            if self.leaf[node]:
+                t = t[near]
+                bodies = self.order[self.start[node]:self.end[node]]
+                values = kernel(self.x[t, None], self.y[t, None], self.m[t, None],
+                                self.x[bodies], self.y[bodies], self.m[bodies])
+                for total, value in zip(totals, values):
+                    total[group] += value.sum(axis=1)
+            else:
+                for child in self.children[node]:
+                    if child >= 0:
+                        stack.append((child, group))
+        return totals
+
+
+def barnes_hut_forces(x, y, m, targets, theta=0.5, leaf_size=8):
+    """Силы от всех тел на тела **targets** за O(N log N).
+    Сигнатура совпадает с gravity.direct_forces, плюс угол раскрытия **theta**.
+    """
+    if not len(x):
+        return np.zeros(0), np.zeros(0)
+    return QuadTree(x, y, m, leaf_size).forces(targets, theta)
@@ -0,0 +1,94 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Сравнение прямого суммирования сил и метода Барнса — Хата.
+Для каждого размера системы генерируется детерминированный набор тел
+(звёзды и планеты в диске), замеряется время полного расчёта сил обоими
+методами и относительная ошибка приближения. Прямое суммирование для
+больших N не запускается, а оценивается по закону N² от последнего замера.
+
+Запуск: python benchmark_forces.py --sizes 100 1000 10000 100000 --theta 0.5
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from barnes_hut import barnes_hut_forces
+from gravity import direct_forces
+
+
+def random_bodies(n, seed=0):
+    """Тела, равномерно разбросанные по диску радиусом 1E13 м."""
+    rng = np.random.default_rng(seed)
+    r = 1E13 * np.sqrt(rng.uniform(0, 1, n))
+    angle = rng.uniform(0, 2 * np.pi, n)
+    m = np.where(rng.uniform(0, 1, n) < 0.05,
+                 rng.uniform(1E29, 1E31, n),
+                 rng.uniform(1E23, 1E27, n))
+    return r * np.cos(angle), r * np.sin(angle), m
+
+
+def best_time(function, repeat, setup=None, budget=None):
+    """Наименьшее время выполнения **function** из не более чем **repeat** попыток
+    и результат последней. **setup** вызывается перед каждой попыткой и в замер
+    не входит; после **budget** секунд замеров повторы прекращаются.
+    """
+    result = None
+    best = float('inf')
+    total = 0.0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        if budget is not None and total > budget:
+            break
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barnes-Hut vs direct force benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--theta", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--direct-limit", type=int, default=20000,
+                        help="наибольшее N, для которого прямое суммирование реально запускается")
+    args = parser.parse_args()
+
+    print(f"{'N':>8} {'direct, s':>12} {'barnes-hut, s':>14} {'speedup':>8} {'rel. error':>11}")
+    crossover = None
+    last_direct = None
+    for n in args.sizes:
+        x, y, m = random_bodies(n)
+        targets = np.arange(n)
+        repeat = args.repeat if n <= 10000 else 1
+
+        bh_time, (bx, by) = best_time(lambda: barnes_hut_forces(x, y, m, targets, args.theta), repeat)
+        if n <= args.direct_limit:
+            direct_time, (dx, dy) = best_time(lambda: direct_forces(x, y, m, targets), repeat)
+            error = np.median(np.hypot(bx - dx, by - dy) / np.hypot(dx, dy))
+            last_direct = (n, direct_time)
+            direct_label = f"{direct_time:12.4f}"
+            error_label = f"{error:11.2e}"
+        else:
+            direct_time = last_direct[1] * (n / last_direct[0]) ** 2
+            direct_label = f"~{direct_time:11.1f}"
+            error_label = f"{'-':>11}"
+
+        if crossover is None and bh_time < direct_time:
+            crossover = n
+        print(f"{n:>8} {direct_label} {bh_time:14.4f} {direct_time / bh_time:8.1f} {error_label}")
+
+    if crossover is None:
+        print("Barnes-Hut is not faster than the direct sum on these sizes")
+    else:
+        print(f"Barnes-Hut is faster starting from N = {crossover} (theta = {args.theta})")
+
+
+if __name__ == "__main__":
+    main()
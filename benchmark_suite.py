@@ -0,0 +1,272 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Набор замеров производительности по размерам системы и подсистемам.
+Системы строятся детерминированно по зерну: generate_solar_system для модели
+и файлов solar_io, write_mega_system из filling_script_1o_1p для файлов
+parse_data.Parser. Каждая подсистема замеряется отдельно (лучшее из нескольких
+повторов), результаты пишутся в JSON вместе с описанием машины и коммита,
+чтобы сравнивать коммиты между собой.
+
+Запуск: python benchmark_suite.py --sizes 10 100 1000 10000 100000 --output bench.json
+Сравнение: python benchmark_suite.py --output new.json --compare bench.json
+"""
+
+import argparse
+import datetime
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+import checkpoint
+from benchmark_forces import best_time
+from filling_script_1o_1p import write_mega_system
+from parse_data import Parser
+from solar_generator import generate_solar_system
+from solar_headless import make_model
+from solar_io import load_space_objects, write_space_objects
+from solar_view import SolarSystemView, window_height, window_width
+
+default_sizes = [10, 100, 1000, 10000, 100000]
+"""Размеры систем по умолчанию"""
+
+size_limits = {
+    "calculate_force": 1000,
+    "forces_direct": 20000,
+}
+"""Наибольший размер системы для замеров с квадратичной сложностью;
+для больших систем результат записывается как null"""
+
+time_step = 1000000
+"""Шаг моделирования в замерах, с"""
+
+repeat_budget = 2.0
+"""Время, после которого повторы замера прекращаются, с"""
+
+noise_floor = 0.002
+"""Замедления меньше этого числа секунд при сравнении считаются шумом"""
+
+
+def generated_system(n, seed=0):
+    """Ровно **n** тел generate_solar_system: звёзд берётся с запасом, лишние тела
+    отбрасываются с конца списка (родители всегда идут раньше своих спутников).
+    """
+    return generate_solar_system(seed, star_count=max(1, math.ceil(n / 14)))[:n]
+
+
+def mega_system_text(n, seed=0):
+    """Текст файла формата Parser из **n** тел write_mega_system."""
+    out = io.StringIO()
+    write_mega_system(out, star_count=max(1, math.ceil(n / 20)), rng=random.Random(seed))
+    lines = [line for line in out.getvalue().splitlines() if line.strip()]
+    return "\n".join(lines[:n]) + "\n"
+
+
+def benchmark_model(space_objects, **settings):
+    """Модель безоконного запуска (solar_headless.make_model) с масштабом окна,
+    чтобы замер перерисовки рисовал систему целиком.
+    """
+    model = make_model(space_objects, **settings)
+    max_distance = max(max(abs(obj.x), abs(obj.y)) for obj in model.space_objects) or 1e12
+    model.scale_factor = 0.4 * min(window_height, window_width) / max_distance
+    return model
+
+
+class RecordingCanvas:
+    """Холст без окна с интерфейсом tkinter.Canvas, который только раздаёт номера
+    элементов. Замер перерисовки с ним показывает стоимость самого вида.
+    """
+
+    def __init__(self):
+        self.items = 0
+
+    def _create(self, *args, **kwargs):
+        self.items += 1
+        return self.items
+
+    create_oval = create_line = create_text = create_rectangle = create_polygon = _create
+
+    def delete(self, *args):
+        pass
+
+    def coords(self, *args):
+        pass
+
+    def move(self, *args):
+        pass
+
+    def itemconfigure(self, *args, **kwargs):
+        pass
+
+    def tag_lower(self, *args):
+        pass
+
+    def tag_raise(self, *args):
+        pass
+
+
+def make_canvas():
+    """Настоящий холст tkinter в скрытом окне, если есть дисплей, иначе RecordingCanvas."""
+    try:
+        import tkinter
+        root = tkinter.Tk()
+        root.withdraw()
+        return tkinter.Canvas(root, width=window_width, height=window_height), "tkinter"
+    except Exception:
+        return RecordingCanvas(), "recording"
+
+
+def benchmark_size(n, seed, directory, canvas):
+    """Замеры всех подсистем на системе из **n** тел. Возвращает словарь секунд."""
+    repeat = 5 if n <= 1000 else (3 if n <= 10000 else 1)
+    results = {}
+
+    def measure(name, function, setup=None):
+        if n > size_limits.get(name, n):
+            results[name] = None
+            return
+        results[name] = best_time(function, repeat, setup, repeat_budget)[0]
+        print(f"N={n} {name}: {results[name]:.5f} s", file=sys.stderr)
+
+    model = benchmark_model(generated_system(n, seed))
+    state = model.ensure_state()
+    measure("recalculate_positions", lambda: model.recalculate_positions(time_step))
+    measure("check_collisions", model.check_collisions)
+
+    forced = benchmark_model(generated_system(n, seed), integrator='leapfrog',
+                        force_solver='barnes_hut' if n > size_limits["forces_direct"] else 'direct')
+    measure("recalculate_positions_leapfrog", lambda: forced.recalculate_positions(time_step))
+
+    measure("calculate_force", lambda: [model.calculate_force(body) for body in model.space_objects])
+    model.force_solver = 'direct'
+    measure("forces_direct", model.calculate_forces)
+    model.force_solver = 'barnes_hut'
+    measure("forces_barnes_hut", model.calculate_forces)
+    model.force_solver = 'direct'
+
+    text_file = os.path.join(directory, f"system_{n}.txt")
+    measure("write_space_objects", lambda: write_space_objects(text_file, model.space_objects))
+    if not os.path.exists(text_file):
+        write_space_objects(text_file, model.space_objects)
+    measure("load_space_objects", lambda: load_space_objects(text_file))
+
+    checkpoint_file = os.path.join(directory, f"system_{n}" + checkpoint.extension)
+    measure("save_checkpoint", lambda: checkpoint.save_checkpoint(checkpoint_file, model))
+    if not os.path.exists(checkpoint_file):
+        checkpoint.save_checkpoint(checkpoint_file, model)
+    measure("load_checkpoint", lambda: checkpoint.load_checkpoint(checkpoint_file).ensure_state())
+
+    parser = Parser()
+    mega_file = os.path.join(directory, f"mega_{n}.txt")
+    with open(mega_file, 'w') as f:
+        f.write(mega_system_text(n, seed))
+    measure("parser_read", lambda: parser.read_space_objects_data_from_file(mega_file))
+    if results["parser_read"] is not None:
+        parsed = parser.read_space_objects_data_from_file(mega_file)
+        measure("parser_write", lambda: parser.write_space_objects_data_to_file(
+            os.path.join(directory, f"mega_{n}_out.txt"), parsed))
+    else:
+        results["parser_write"] = None
+
+    view = SolarSystemView(None, model, canvas)
+    measure("redraw", view.redraw_all)
+
+    results["bodies"] = state.n
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, seed=0):
+    """Замеры по всем размерам **sizes**. Возвращает словарь для записи в JSON."""
+    canvas, canvas_kind = make_canvas()
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec='seconds'),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "seed": seed,
+            "canvas": canvas_kind,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            report["results"][str(n)] = benchmark_size(n, seed, directory, canvas)
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Список замедлений относительно **baseline** больше чем в 1 + **tolerance** раз
+    (и больше noise_floor секунд): кортежи (размер, замер, было, стало).
+    """
+    regressions = []
+    for size, results in report["results"].items():
+        old_results = baseline["results"].get(size, {})
+        for name, seconds in results.items():
+            old = old_results.get(name)
+            if name == "bodies" or seconds is None or old is None:
+                continue
+            if seconds > old * (1 + tolerance) and seconds - old > noise_floor:
+                regressions.append((size, name, old, seconds))
+    return regressions
+
+
+def print_report(report):
+    names = sorted({name for results in report["results"].values() for name in results} - {"bodies"})
+    sizes = list(report["results"])
+    print(f"{'benchmark':<32}" + "".join(f"{size:>12}" for size in sizes))
+    for name in names:
+        cells = []
+        for size in sizes:
+            seconds = report["results"][size].get(name)
+            cells.append(f"{'-':>12}" if seconds is None else f"{seconds:12.5f}")
+        print(f"{name:<32}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solar system benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=default_sizes)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл JSON для результатов")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON предыдущего запуска для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="допустимое относительное замедление при сравнении")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as out_file:
+            json.dump(report, out_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as in_file:
+            baseline = json.load(in_file)
+        regressions = compare(report, baseline, args.tolerance)
+        for size, name, old, new in regressions:
+            print(f"REGRESSION {name} at N={size}: {old:.5f} s -> {new:.5f} s ({new / old:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {baseline['meta'].get('commit')}")
+
+
+if __name__ == "__main__":
+    main()
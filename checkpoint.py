@@ -0,0 +1,221 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Двоичные контрольные точки состояния модели.
+Файл состоит из сигнатуры, длины заголовка, заголовка в JSON и столбцов
+хранилища состояния, записанных подряд как сырые массивы. Смещения столбцов
+выровнены на 8 байт, поэтому столбцы читаются без разбора файла (а по
+желанию отображаются в память, numpy.memmap).
+Восстанавливается всё состояние SolarSystemModel: столбцы хранилища
+с параметрами орбит и связями с родителями, время, масштаб, настройки
+и, если они были построены, кеплеровы орбиты.
+"""
+
+import contextlib
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from kepler import KeplerOrbits
+from solar_model import SolarSystemModel
+from solar_state import SystemState, float_columns
+
+magic = b"SOLARCKP"
+"""Сигнатура файла контрольной точки"""
+
+version = 1
+"""Версия формата"""
+
+extension = ".ckpt"
+"""Расширение файлов контрольных точек"""
+
+state_columns = float_columns + ('parent', 'type_code', 'clockwise')
+"""Столбцы хранилища, записываемые как есть"""
+
+kepler_columns = ('a', 'e', 'omega', 'M0', 'mean_motion', 'direction', 'valid', 'rx', 'ry')
+"""Столбцы кеплеровых орбит"""
+
+model_settings = ('use_arrays', 'force_solver', 'theta', 'integrator', 'multirate',
+                  'timestep_accuracy', 'max_rung', 'orbit_propagator',
+                  'physical_time', 'scale_factor', 'collision_count')
+"""Атрибуты модели, сохраняемые в заголовке"""
+
+
+def color_palette(colors):
+    """Список различных цветов и номер цвета каждого тела в нём."""
+    palette = {}
+    index = np.fromiter((palette.setdefault(color, len(palette)) for color in colors),
+                        dtype=np.uint32, count=len(colors))
+    return list(palette), index
+
+
+def model_header(model):
+    """Настройки модели **model** для заголовка."""
+    return {name: getattr(model, name) for name in model_settings}
+
+
+def write_header(out_file, n, settings, palette, columns, kepler_epoch=None):
+    """Пишет сигнатуру и заголовок с раскладкой столбцов **columns** — списка пар
+    (имя, dtype). Возвращает смещение начала данных и смещения столбцов от него.
+    """
+    header = {
+        "version": version,
+        "n": n,
+        "model": settings,
+        "colors": palette,
+        "kepler_epoch": kepler_epoch,
+        "columns": [],
+    }
+    offsets = []
+    offset = 0
+    for name, dtype in columns:
+        dtype = np.dtype(dtype)
+        header["columns"].append({"name": name, "dtype": dtype.str, "offset": offset})
+        offsets.append(offset)
+        offset += -(-n * dtype.itemsize // 8) * 8
+
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-(len(magic) + 8 + len(header_bytes)) % 8)
+    out_file.write(magic)
+    out_file.write(struct.pack("<II", version, len(header_bytes)))
+    out_file.write(header_bytes)
+    return len(magic) + 8 + len(header_bytes), offsets, offset
+
+
+def save_checkpoint(filename, model):
+    """Записывает состояние модели **model** в файл **filename**."""
+    state = model.ensure_state()
+    kepler = model.current_kepler()
+    save_state(filename, state, model, kepler)
+
+
+def save_state(filename, state, model=None, kepler=None):
+    """Записывает хранилище **state** в файл **filename**. Настройки берутся
+    из модели **model** (по умолчанию — как у новой модели), кеплеровы орбиты
+    **kepler** записываются, если переданы.
+    """
+    palette, color_index = color_palette(state.color)
+
+    columns = [(name, getattr(state, name)) for name in state_columns]
+    columns.append(('color', color_index))
+    if kepler is not None:
+        columns += [('kepler_' + name, getattr(kepler, name)) for name in kepler_columns]
+
+    with replacing_file(filename) as out_file:
+        write_header(out_file, state.n, model_header(model or SolarSystemModel()), palette,
+                     [(name, column.dtype) for name, column in columns],
+                     kepler.epoch if kepler is not None else None)
+        for name, column in columns:
+            np.ascontiguousarray(column).tofile(out_file)
+            out_file.write(b"\0" * (-column.nbytes % 8))
+
+
+@contextlib.contextmanager
+def replacing_file(filename):
+    """Файл для записи вместо **filename**: пишется во временный файл рядом
+    и подменяет filename (os.replace) только после успешной записи. Так сбой
+    посреди записи не портит прежнюю контрольную точку, а отображения старого
+    файла в память (в том числе столбцы модели, из него загруженной) остаются
+    целыми — файл не усекается на месте. Временный файл открыт и для чтения,
+    чтобы его можно было отобразить в память (см. create_checkpoint).
+    """
+    descriptor, temporary = tempfile.mkstemp(prefix=".", suffix=".tmp",
+                                             dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(descriptor, 'w+b') as out_file:
+            yield out_file
+            out_file.flush()
+            os.fsync(out_file.fileno())
+        try:
+            mode = os.stat(filename).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temporary, mode)
+        os.replace(temporary, filename)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+@contextlib.contextmanager
+def create_checkpoint(filename, n, palette, model=None):
+    """Создаёт контрольную точку на **n** тел с палитрой цветов **palette**.
+    Используется в with: внутри блока доступны её столбцы (и 'color' — номера
+    цветов в палитре), отображённые в память для записи, так что систему можно
+    записывать по частям, не держа её в памяти целиком. Как и save_state, файл
+    собирается во временном файле рядом и подменяет **filename** только после
+    выхода из блока без ошибок.
+    """
+    columns = [(name, np.float64) for name in float_columns]
+    columns += [('parent', np.int64), ('type_code', np.int8), ('clockwise', np.bool_), ('color', np.uint32)]
+    with replacing_file(filename) as out_file:
+        data_offset, offsets, size = write_header(out_file, n, model_header(model or SolarSystemModel()),
+                                                  list(palette), columns)
+        out_file.truncate(data_offset + size)
+        out_file.flush()
+        if not n:
+            yield {name: np.zeros(0, dtype=dtype) for name, dtype in columns}
+            return
+        arrays = {name: np.memmap(out_file, dtype=dtype, mode='r+', offset=data_offset + offset, shape=(n,))
+                  for (name, dtype), offset in zip(columns, offsets)}
+        yield arrays
+        for column in arrays.values():
+            column.flush()
+
+
+def read_header(filename):
+    """Заголовок контрольной точки и смещение начала данных в файле."""
+    with open(filename, 'rb') as in_file:
+        if in_file.read(len(magic)) != magic:
+            raise ValueError(f"{filename} не является контрольной точкой")
+        file_version, header_length = struct.unpack("<II", in_file.read(8))
+        if file_version != version:
+            raise ValueError(f"Неподдерживаемая версия контрольной точки: {file_version}")
+        header = json.loads(in_file.read(header_length))
+    return header, len(magic) + 8 + header_length
+
+
+def load_checkpoint(filename, model=None, memory_map=False):
+    """Восстанавливает модель из файла **filename** и возвращает её.
+    Если передана модель **model**, состояние загружается в неё.
+    По умолчанию столбцы читаются в память целиком. При **memory_map** они
+    отображаются в память с копированием при записи: читаются только реально
+    используемые страницы, но файл нельзя менять на месте, пока модель жива
+    (save_checkpoint его не меняет, а подменяет новым).
+    """
+    header, data_offset = read_header(filename)
+    n = header["n"]
+    columns = {}
+    for column in header["columns"]:
+        dtype = np.dtype(column["dtype"])
+        offset = data_offset + column["offset"]
+        if not n:
+            columns[column["name"]] = np.zeros(0, dtype=dtype)
+        elif memory_map:
+            columns[column["name"]] = np.memmap(filename, dtype=dtype, mode='c', offset=offset, shape=(n,))
+        else:
+            columns[column["name"]] = np.fromfile(filename, dtype=dtype, count=n, offset=offset)
+
+    state = SystemState(n)
+    for name in state_columns:
+        setattr(state, name, columns[name])
+    state.color = np.array(header["colors"] or [""], dtype=object)[columns["color"]]
+
+    if model is None:
+        model = SolarSystemModel()
+    model.load_state(state)
+    for name, value in header["model"].items():
+        setattr(model, name, value)
+
+    if header["kepler_epoch"] is not None:
+        model.kepler = KeplerOrbits.from_columns(
+            state, header["kepler_epoch"],
+            {name: columns['kepler_' + name] for name in kepler_columns})
+        model.kepler_sync = model.physical_time, model.collision_count
+    return model
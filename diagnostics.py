@@ -0,0 +1,118 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Интегралы движения системы для контроля точности моделирования:
+кинетическая и потенциальная энергия, импульс и момент импульса.
+Всё считается свёртками массивов NumPy; потенциальная энергия для небольших
+систем — прямым суммированием, для больших — по дереву Барнса — Хата.
+Функции принимают как хранилище SystemState, так и список объектов.
+"""
+
+import time
+
+import numpy as np
+
+from barnes_hut import QuadTree
+from gravity import direct_potentials
+
+tree_threshold = 10000
+"""Число тел, начиная с которого потенциальная энергия считается по дереву"""
+
+
+def body_arrays(bodies):
+    """Массивы x, y, Vx, Vy, m хранилища состояния или списка объектов."""
+    if hasattr(bodies, 'n'):
+        return bodies.x, bodies.y, bodies.Vx, bodies.Vy, bodies.m
+    return tuple(np.fromiter((getattr(obj, name) for obj in bodies), dtype=float, count=len(bodies))
+                 for name in ('x', 'y', 'Vx', 'Vy', 'm'))
+
+
+def kinetic_energy(m, Vx, Vy):
+    return 0.5 * np.dot(m, Vx * Vx + Vy * Vy)
+
+
+def potential_energy(x, y, m, solver='auto', theta=0.5):
+    """Полная потенциальная энергия всех пар тел.
+
+    Параметры:
+
+    **solver** — 'direct', 'barnes_hut' или 'auto' (по дереву начиная с tree_threshold тел).
+    **theta** — угол раскрытия для дерева. Центры масс узлов дают систематическую
+    ошибку порядка theta² / 50 от энергии (0.5 % при theta = 0.5), поэтому дерево
+    годится для грубого контроля больших систем, а не для измерения малого дрейфа.
+    """
+    if len(x) < 2:
+        return 0.0
+    if solver == 'auto':
+        solver = 'barnes_hut' if len(x) >= tree_threshold else 'direct'
+    targets = np.arange(len(x))
+    if solver == 'direct':
+        energy = direct_potentials(x, y, m, targets)
+    elif solver == 'barnes_hut':
+        energy = QuadTree(x, y, m).potentials(targets, theta)
+    else:
+        raise ValueError(f"Неизвестный способ расчёта потенциальной энергии: {solver}")
+    # Каждая пара учтена дважды: по разу для каждого из тел
+    return 0.5 * energy.sum()
+
+
+def momentum(m, Vx, Vy):
+    """Полный импульс системы (px, py)."""
+    return np.dot(m, Vx), np.dot(m, Vy)
+
+
+def angular_momentum(x, y, Vx, Vy, m):
+    """Момент импульса системы относительно начала координат."""
+    return np.dot(m, x * Vy - y * Vx)
+
+
+def system_diagnostics(bodies, solver='auto', theta=0.5):
+    """Словарь интегралов движения: ke, pe, te, px, py, L."""
+    x, y, Vx, Vy, m = body_arrays(bodies)
+    ke = kinetic_energy(m, Vx, Vy)
+    pe = potential_energy(x, y, m, solver, theta)
+    px, py = momentum(m, Vx, Vy)
+    return {
+        "ke": ke,
+        "pe": pe,
+        "te": ke + pe,
+        "px": px,
+        "py": py,
+        "L": angular_momentum(x, y, Vx, Vy, m),
+    }
+
+
+def calculate_system_energy(bodies, solver='auto', theta=0.5):
+    """Кинетическая, потенциальная и полная энергия системы."""
+    x, y, Vx, Vy, m = body_arrays(bodies)
+    ke = kinetic_energy(m, Vx, Vy)
+    pe = potential_energy(x, y, m, solver, theta)
+    return ke, pe, ke + pe
+
+
+class DiagnosticsBudget:
+    """Решает, когда пора снова считать диагностику, так чтобы на неё уходила
+    доля **fraction** общего времени работы: после расчёта, занявшего c секунд,
+    следующий разрешается через c * (1 - fraction) / fraction секунд.
+    """
+
+    def __init__(self, fraction=0.05):
+        if not 0 < fraction <= 1:
+            raise ValueError("Доля времени на диагностику должна быть в промежутке (0, 1]")
+        self.fraction = fraction
+        self.next_time = 0.0
+        self.spent = 0.0
+        self.runs = 0
+
+    def due(self):
+        return time.perf_counter() >= self.next_time
+
+    def run(self, function, *args, **kwargs):
+        """Вызывает **function** и по затраченному времени назначает следующий расчёт."""
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        end = time.perf_counter()
+        self.spent += end - start
+        self.runs += 1
+        self.next_time = end + (end - start) * (1 - self.fraction) / self.fraction
+        return result
@@ -0,0 +1,109 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Ансамбль моделирований случайно сгенерированных систем.
+Каждое зерно генератора даёт свою систему; системы моделируются
+независимо в отдельных процессах (ProcessPoolExecutor), а в ответ
+возвращаются только краткие итоги каждого запуска.
+
+Запуск: python ensemble.py --seeds 0 99 --dt 100000 --steps 1000
+"""
+
+import argparse
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from diagnostics import calculate_system_energy
+from solar_generator import generate_solar_system
+from solar_headless import make_model, run_model
+
+default_settings = {'integrator': 'leapfrog'}
+"""Настройки модели по умолчанию: звёзды движутся под действием сил"""
+
+escape_factor = 10
+"""Тело считается улетевшим, если оно дальше от центра масс, чем
+escape_factor начальных радиусов системы"""
+
+
+def distances_from_center(state):
+    total = state.m.sum()
+    cx = (state.m * state.x).sum() / total
+    cy = (state.m * state.y).sum() / total
+    return np.hypot(state.x - cx, state.y - cy)
+
+
+def simulate_seed(seed, dt, steps, generation, settings):
+    """Генерирует систему по **seed**, моделирует её и возвращает словарь итогов:
+    число тел и столкновений, относительный дрейф энергии, число улетевших тел.
+    """
+    model = make_model(generate_solar_system(seed, **generation), **settings)
+    state = model.ensure_state()
+    initial_energy = calculate_system_energy(state)[2]
+    initial_radius = distances_from_center(state).max()
+
+    stats = run_model(model, dt, steps)
+
+    state = model.ensure_state()
+    energy = calculate_system_energy(state)[2]
+    return {
+        "seed": seed,
+        "bodies": state.n,
+        "collisions": model.collision_count,
+        "energy_drift": abs((energy - initial_energy) / initial_energy),
+        "escapes": int((distances_from_center(state) > escape_factor * initial_radius).sum()),
+        "seconds": stats["seconds"],
+    }
+
+
+def run_ensemble(seeds, dt, steps, generation=None, settings=None, workers=None):
+    """Моделирует по системе на каждое зерно из **seeds** в пуле процессов.
+    Возвращает список итогов simulate_seed в порядке зёрен.
+
+    Параметры:
+
+    **seeds** — список зёрен генератора.
+    **dt**, **steps** — шаг по времени и число шагов каждого запуска.
+    **generation** — параметры generate_solar_system (star_count, planet_counts и т. д.).
+    **settings** — параметры модели для solar_headless.make_model.
+    **workers** — число процессов (None — по числу ядер).
+    """
+    simulate = functools.partial(simulate_seed, dt=dt, steps=steps,
+                                 generation=generation or {},
+                                 settings=default_settings if settings is None else settings)
+    seeds = list(seeds)
+    workers = workers or os.cpu_count() or 1
+    # Несколько зёрен на задачу, чтобы короткие запуски не упирались в пересылку между процессами
+    chunksize = max(1, len(seeds) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(simulate, seeds, chunksize=chunksize))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ensemble of randomly generated systems")
+    parser.add_argument("--seeds", type=int, nargs=2, default=[0, 15], metavar=("FIRST", "LAST"))
+    parser.add_argument("--dt", type=float, default=100000)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--stars", type=int, default=3)
+    parser.add_argument("--planets", type=int, nargs="+", default=[10, 20, 10])
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summaries = run_ensemble(range(args.seeds[0], args.seeds[1] + 1), args.dt, args.steps,
+                             generation={"star_count": args.stars, "planet_counts": args.planets},
+                             workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'seed':>6} {'bodies':>7} {'collisions':>11} {'energy drift':>13} {'escapes':>8}")
+    for summary in summaries:
+        print(f"{summary['seed']:>6} {summary['bodies']:>7} {summary['collisions']:>11} "
+              f"{summary['energy_drift']:13.3e} {summary['escapes']:>8}")
+    print(f"{len(summaries)} runs in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
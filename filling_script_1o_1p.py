@@ -33,14 +33,19 @@ satellite_orbit_radius_max = 2.0E9    # 2 млн км
 satellite_mass_ratio_min = 0.0001 # 0.01% от массы планеты
 satellite_mass_ratio_max = 0.01   # 1% от массы планеты (очень крупный спутник)
 
-with open('mega_system.txt', 'w') as f:
+def write_mega_system(f, star_count=7, rng=random):
+    """Пишет в открытый файл **f** систему в формате parse_data.Parser:
+    чёрная дыра в центре, **star_count** звёзд вокруг неё, у звёзд планеты,
+    у части планет спутники. Случайные величины берутся из **rng**
+    (например, random.Random(seed) для воспроизводимой системы).
+    """
     print("Star0 1 black 1E35 0 0 0 0\n", file=f)
-    for i in range(1,8):
-        angle = random.uniform(0, 2*pi)
-        r = star_orbit_radius_min + (i-1) * (star_orbit_radius_max - star_orbit_radius_min)/7 #random.uniform(star_orbit_radius_min, star_orbit_radius_max)
+    for i in range(1, star_count + 1):
+        angle = rng.uniform(0, 2*pi)
+        r = star_orbit_radius_min + (i-1) * (star_orbit_radius_max - star_orbit_radius_min)/star_count #random.uniform(star_orbit_radius_min, star_orbit_radius_max)
         x = r * math.cos(angle)
         y = r * math.sin(angle)
-        m = random.uniform(star_mass_min, star_mass_max)
+        m = rng.uniform(star_mass_min, star_mass_max)
         velocity = (G*black_hole_mass/r)**0.5
         velocity_x = velocity * -math.sin(angle)
         velocity_y = velocity * math.cos(angle)
@@ -50,11 +55,11 @@ with open('mega_system.txt', 'w') as f:
                 direction_planet = 1
             else:
                 direction_planet = -1
-            angle_planet = random.uniform(0, 2*pi)
+            angle_planet = rng.uniform(0, 2*pi)
             r_planet = j * (planet_orbit_radius_max - planet_orbit_radius_min)/30
             x_planet = r_planet * math.cos(angle_planet) + x
             y_planet = r_planet * math.sin(angle_planet) + y
-            m_planet = random.uniform(planet_mass_min, planet_mass_max)
+            m_planet = rng.uniform(planet_mass_min, planet_mass_max)
             velocity_planet = (G*m/r_planet)**0.5
             velocity_planet_x = velocity_planet * -math.sin(angle_planet) * direction_planet + velocity_x
             velocity_planet_y = velocity_planet * math.cos(angle_planet) * direction_planet + velocity_y
@@ -62,24 +67,28 @@ with open('mega_system.txt', 'w') as f:
             direction_sat = -1
             if (j % 5 == 0 and i % 2 == 1 and j in [10, 20, 30]):
                 for k in range(1,3):
-                    angle_sat = random.uniform(0, 2 * pi)
-                    r_sat = random.uniform(satellite_orbit_radius_min, satellite_orbit_radius_max)
+                    angle_sat = rng.uniform(0, 2 * pi)
+                    r_sat = rng.uniform(satellite_orbit_radius_min, satellite_orbit_radius_max)
                     x_sat = r_sat * math.cos(angle_sat) + x_planet
                     y_sat = r_sat * math.sin(angle_sat) + y_planet
-                    m_sat = random.uniform(satellite_mass_ratio_min, satellite_mass_ratio_max) * m_planet
+                    m_sat = rng.uniform(satellite_mass_ratio_min, satellite_mass_ratio_max) * m_planet
                     velocity_sat = (G * m_planet / r_sat) ** 0.5
                     velocity_sat_x = velocity_sat * -math.sin(angle_sat) * direction_sat + velocity_planet_x
                     velocity_sat_y = velocity_sat * math.cos(angle_sat) * direction_sat + velocity_planet_y
                     print(f"Satellite{k}_{j}_{i} 1 white {m_sat} {x_sat} {y_sat} {velocity_sat_x} {velocity_sat_y} Planet{j}_{i}\n",file=f)
             if (j % 5 == 0 and i % 2 == 0 and j in [5, 10, 15]):
-                angle_sat = random.uniform(0, 2*pi)
-                r_sat = random.uniform(satellite_orbit_radius_min, satellite_orbit_radius_max)
+                angle_sat = rng.uniform(0, 2*pi)
+                r_sat = rng.uniform(satellite_orbit_radius_min, satellite_orbit_radius_max)
                 x_sat = r_sat * math.cos(angle_sat) + x_planet
                 y_sat = r_sat * math.sin(angle_sat) + y_planet
-                m_sat = random.uniform(satellite_mass_ratio_min, satellite_mass_ratio_max) * m_planet
+                m_sat = rng.uniform(satellite_mass_ratio_min, satellite_mass_ratio_max) * m_planet
                 velocity_sat = (G*m_planet/r_sat)**0.5
                 velocity_sat_x = velocity_sat * -math.sin(angle_sat) * direction_sat + velocity_planet_x
                 velocity_sat_y = velocity_sat * math.cos(angle_sat) * direction_sat + velocity_planet_y
                 print(f"Satellite1_{j}_{i} 1 white {m_sat} {x_sat} {y_sat} {velocity_sat_x} {velocity_sat_y} Planet{j}_{i}\n", file=f)
-    f.close()
-print("Завершено формирование звездной системы")
+
+
+if __name__ == "__main__":
+    with open('mega_system.txt', 'w') as f:
+        write_mega_system(f)
+    print("Завершено формирование звездной системы")
@@ -0,0 +1,82 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Замер времени по фазам каждого кадра окна.
+Кадр размечается вызовами begin_frame, mark(фаза) после каждой фазы и
+end_frame; время фаз пишется в кольцевой буфер на capacity последних кадров.
+Разметка стоит пару вызовов perf_counter на фазу, так что профилировщик можно
+держать включённым всегда, а рисовать его сводку поверх холста — по желанию.
+"""
+
+import time
+
+import numpy as np
+
+overlay_tag = "profiler"
+"""Тег элементов сводки на холсте"""
+
+
+class FrameProfiler:
+    """Кольцевой буфер времени фаз **phases** для **capacity** последних кадров."""
+
+    def __init__(self, phases, capacity=600):
+        self.phases = tuple(phases)
+        self.capacity = capacity
+        self.phase_index = {name: i for i, name in enumerate(self.phases)}
+        self.start_times = np.zeros(capacity)
+        self.durations = np.zeros((capacity, len(self.phases)))
+        self.count = 0
+        self._row = None
+        self._last = 0.0
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        self._row = self.count % self.capacity
+        self.start_times[self._row] = now
+        self.durations[self._row] = 0
+        self._last = now
+
+    def mark(self, phase):
+        """Относит к фазе **phase** время, прошедшее с начала кадра или предыдущей отметки."""
+        now = time.perf_counter()
+        self.durations[self._row, self.phase_index[phase]] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        self.count += 1
+        self._row = None
+
+    def frames(self):
+        """Записанные кадры по порядку: массив начал кадров и массив времени фаз."""
+        stored = min(self.count, self.capacity)
+        order = (np.arange(self.count - stored, self.count)) % self.capacity
+        return self.start_times[order], self.durations[order]
+
+    def summary(self, last=60):
+        """Кадров в секунду и среднее время каждой фазы за **last** последних кадров."""
+        starts, durations = self.frames()
+        starts = starts[-last:]
+        durations = durations[-last:]
+        fps = (len(starts) - 1) / (starts[-1] - starts[0]) if len(starts) > 1 and starts[-1] > starts[0] else 0.0
+        means = durations.mean(axis=0) if len(durations) else np.zeros(len(self.phases))
+        return fps, dict(zip(self.phases, means))
+
+    def draw_overlay(self, canvas, x, y):
+        """Рисует сводку на холсте **canvas** в правом верхнем углу с точкой (x, y)."""
+        fps, means = self.summary()
+        lines = [f"FPS {fps:5.1f}"]
+        lines += [f"{name:<8}{seconds * 1000:7.2f} ms" for name, seconds in means.items()]
+        lines.append(f"{'total':<8}{sum(means.values()) * 1000:7.2f} ms")
+        canvas.delete(overlay_tag)
+        canvas.create_text(x, y, text="\n".join(lines), anchor="ne", fill="white",
+                           font="Courier 10", tag=overlay_tag)
+
+    def write_csv(self, filename):
+        """Сохраняет записанные кадры в CSV: номер кадра, начало (с), время фаз (мс) и сумма."""
+        starts, durations = self.frames()
+        first = self.count - len(starts)
+        with open(filename, 'w') as out_file:
+            out_file.write("frame,start_s," + ",".join(f"{name}_ms" for name in self.phases) + ",total_ms\n")
+            for i, (start, row) in enumerate(zip(starts, durations * 1000)):
+                out_file.write(f"{first + i},{start - starts[0]:.6f},"
+                               + ",".join(f"{value:.4f}" for value in row) + f",{row.sum():.4f}\n")
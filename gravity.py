@@ -0,0 +1,111 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Векторный расчёт сил тяготения для хранилища состояния solar_state.SystemState.
+Закон взаимодействия тот же, что в SolarSystemModel.calculate_force:
+на расстояниях меньше **min_distance** тела отталкиваются.
+"""
+
+import numpy as np
+
+from solar_state import SATELLITE
+
+gravitational_constant = 6.67408E-11
+"""Гравитационная постоянная Ньютона G"""
+
+min_distance = 1e9
+"""Расстояние, ближе которого притяжение сменяется отталкиванием"""
+
+direct_chunk_size = 1 << 16
+"""Максимальное число пар тел, обрабатываемых за один проход прямого суммирования"""
+
+
+def pair_forces(tx, ty, tm, sx, sy, sm):
+    """Возвращает силы, действующие на тела-цели со стороны тел-источников.
+    Массивы целей и источников должны быть согласованы по правилам broadcasting.
+    Пары на нулевом расстоянии (в том числе тело само с собой) не взаимодействуют.
+    """
+    dx = sx - tx
+    dy = sy - ty
+    r2 = dx * dx + dy * dy
+    r = np.sqrt(r2)
+    attraction = gravitational_constant * tm * sm
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = attraction / (r2 * r)
+        close = r < min_distance
+        if close.any():
+            magnitude = np.where(close, -10 * attraction / min_distance ** 2 / r, magnitude)
+            magnitude = np.where(r > 0, magnitude, 0.0)
+    return magnitude * dx, magnitude * dy
+
+
+def pair_potential(tx, ty, tm, sx, sy, sm):
+    """Потенциальная энергия пар тел-целей и тел-источников, согласованная с pair_forces:
+    -G m1 m2 / r снаружи **min_distance**, а внутри — линейный рост, дающий
+    постоянное отталкивание. Пары на нулевом расстоянии энергии не дают.
+    """
+    dx = sx - tx
+    dy = sy - ty
+    r = np.sqrt(dx * dx + dy * dy)
+    attraction = gravitational_constant * tm * sm
+    with np.errstate(divide='ignore', invalid='ignore'):
+        energy = -attraction / r
+        close = r < min_distance
+        if close.any():
+            energy = np.where(close, attraction * (10 * (min_distance - r) / min_distance ** 2 - 1 / min_distance),
+                              energy)
+            energy = np.where(r > 0, energy, 0.0)
+    return energy
+
+
+def direct_potentials(x, y, m, targets):
+    """Потенциальная энергия тел **targets** в поле всех тел, прямым суммированием O(N²)."""
+    energy = np.zeros(len(targets))
+    chunk = max(1, direct_chunk_size // max(1, len(x)))
+    for start in range(0, len(targets), chunk):
+        t = targets[start:start + chunk]
+        energy[start:start + chunk] = pair_potential(x[t, None], y[t, None], m[t, None], x, y, m).sum(axis=1)
+    return energy
+
+
+def direct_forces(x, y, m, targets):
+    """Прямое суммирование O(N²) сил от всех тел на тела **targets**.
+
+    Параметры:
+
+    **x**, **y**, **m** — координаты и массы всех тел.
+    **targets** — индексы тел, для которых считается сила.
+    """
+    Fx = np.zeros(len(targets))
+    Fy = np.zeros(len(targets))
+    chunk = max(1, direct_chunk_size // max(1, len(x)))
+    for start in range(0, len(targets), chunk):
+        t = targets[start:start + chunk]
+        fx, fy = pair_forces(x[t, None], y[t, None], m[t, None], x, y, m)
+        Fx[start:start + chunk] = fx.sum(axis=1)
+        Fy[start:start + chunk] = fy.sum(axis=1)
+    return Fx, Fy
+
+
+def system_forces(state, solver, **options):
+    """Заполняет state.Fx и state.Fy.
+    Спутник чувствует только свою родительскую планету, остальные тела — все тела системы.
+
+    Параметры:
+
+    **state** — хранилище состояния.
+    **solver** — функция вида direct_forces(x, y, m, targets, **options).
+    """
+    satellite = state.type_code == SATELLITE
+    targets = np.flatnonzero(~satellite)
+    state.Fx[:] = 0
+    state.Fy[:] = 0
+    if len(targets):
+        state.Fx[targets], state.Fy[targets] = solver(state.x, state.y, state.m, targets, **options)
+
+    satellites = np.flatnonzero(satellite & (state.parent >= 0))
+    if len(satellites):
+        parent = state.parent[satellites]
+        state.Fx[satellites], state.Fy[satellites] = pair_forces(
+            state.x[satellites], state.y[satellites], state.m[satellites],
+            state.x[parent], state.y[parent], state.m[parent])
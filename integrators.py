@@ -0,0 +1,94 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Интеграторы движения свободных тел (звёзд и тел без родителя).
+Каждый интегратор имеет вид integrator(state, idx, dt, acceleration):
+**state** — хранилище состояния, **idx** — индексы свободных тел,
+**acceleration(targets)** — функция, возвращающая ускорения (ax, ay)
+тел targets при текущих координатах в хранилище.
+Симплектические схемы сохраняют энергию на больших шагах по времени
+гораздо лучше явного метода Эйлера.
+"""
+
+import numpy as np
+
+
+def euler(state, idx, dt, acceleration):
+    """Равномерное прямолинейное движение без учёта сил (прежнее поведение модели)."""
+    state.x[idx] += state.Vx[idx] * dt
+    state.y[idx] += state.Vy[idx] * dt
+
+
+def drift(state, idx, dt):
+    state.x[idx] += state.Vx[idx] * dt
+    state.y[idx] += state.Vy[idx] * dt
+
+
+def kick(state, idx, dt, acceleration):
+    ax, ay = acceleration(idx)
+    state.Vx[idx] += ax * dt
+    state.Vy[idx] += ay * dt
+
+
+def leapfrog(state, idx, dt, acceleration):
+    """Схема «перелёт» drift-kick-drift, одно вычисление сил за шаг, 2-й порядок."""
+    drift(state, idx, dt / 2)
+    kick(state, idx, dt, acceleration)
+    drift(state, idx, dt / 2)
+
+
+def start_acceleration(state, idx, acceleration):
+    """Ускорения тел **idx** в начале шага. Если предыдущий шаг закончился
+    вычислением ускорений этих же тел (см. keep_acceleration) и с тех пор тела
+    не сдвинулись (столкновения, seek, другой интегратор), они берутся готовыми,
+    иначе вычисляются заново.
+    """
+    kept = state.kept_acceleration
+    if (kept is not None and kept[0] is idx and np.array_equal(kept[1], state.x[idx])
+            and np.array_equal(kept[2], state.y[idx])):
+        return kept[3], kept[4]
+    return acceleration(idx)
+
+
+def keep_acceleration(state, idx, ax, ay):
+    """Запоминает ускорения **ax**, **ay** тел **idx** при их текущих положениях
+    для start_acceleration следующего шага.
+    """
+    state.kept_acceleration = idx, state.x[idx], state.y[idx], ax, ay
+
+
+def velocity_verlet(state, idx, dt, acceleration):
+    """Скоростной метод Верле, 2-й порядок. Ускорения на конец шага
+    переходят в начало следующего, так что силы считаются один раз за шаг.
+    """
+    ax, ay = start_acceleration(state, idx, acceleration)
+    state.x[idx] += state.Vx[idx] * dt + ax * dt ** 2 / 2
+    state.y[idx] += state.Vy[idx] * dt + ay * dt ** 2 / 2
+    new_ax, new_ay = acceleration(idx)
+    state.Vx[idx] += (ax + new_ax) * dt / 2
+    state.Vy[idx] += (ay + new_ay) * dt / 2
+    keep_acceleration(state, idx, new_ax, new_ay)
+
+
+yoshida_w1 = 1 / (2 - 2 ** (1 / 3))
+yoshida_w0 = -2 ** (1 / 3) / (2 - 2 ** (1 / 3))
+yoshida_drifts = (yoshida_w1 / 2, (yoshida_w0 + yoshida_w1) / 2,
+                  (yoshida_w0 + yoshida_w1) / 2, yoshida_w1 / 2)
+yoshida_kicks = (yoshida_w1, yoshida_w0, yoshida_w1)
+
+
+def yoshida4(state, idx, dt, acceleration):
+    """Схема Иошиды 4-го порядка, три вычисления сил за шаг."""
+    for drift_weight, kick_weight in zip(yoshida_drifts, yoshida_kicks):
+        drift(state, idx, drift_weight * dt)
+        kick(state, idx, kick_weight * dt, acceleration)
+    drift(state, idx, yoshida_drifts[-1] * dt)
+
+
+integrators = {
+    'euler': euler,
+    'leapfrog': leapfrog,
+    'verlet': velocity_verlet,
+    'yoshida4': yoshida4,
+}
+"""Доступные интеграторы по имени (SolarSystemModel.integrator)"""
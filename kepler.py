@@ -0,0 +1,192 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Аналитическое движение планет и спутников по кеплеровым орбитам.
+Элементы орбиты каждого тела относительно родителя вычисляются один раз
+по его координатам и скорости (эллипс или гипербола), после чего положение
+на любой момент времени находится решением уравнения Кеплера методом Ньютона
+сразу для всех тел уровня. Поэтому переход к произвольному моменту времени
+стоит одного прохода по системе, а не миллионов шагов.
+"""
+
+import numpy as np
+
+from gravity import gravitational_constant
+
+newton_iterations = 50
+"""Наибольшее число итераций метода Ньютона"""
+
+newton_tolerance = 1e-12
+"""Точность решения уравнения Кеплера по аномалии"""
+
+
+def solve_elliptic(M, e):
+    """Эксцентрическая аномалия E из уравнения Кеплера M = E - e sin E."""
+    E = np.where(e < 0.8, M, np.pi * np.sign(M))
+    for _ in range(newton_iterations):
+        delta = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E -= delta
+        if not len(delta) or np.abs(delta).max() < newton_tolerance:
+            break
+    return E
+
+
+def solve_hyperbolic(M, e):
+    """Гиперболическая аномалия H из уравнения M = e sh H - H."""
+    H = np.sign(M) * np.log(2 * np.abs(M) / e + 1.8)
+    for _ in range(newton_iterations):
+        delta = (e * np.sinh(H) - H - M) / (e * np.cosh(H) - 1)
+        H -= delta
+        if not len(delta) or np.abs(delta).max() < newton_tolerance * np.maximum(1, np.abs(H)).max():
+            break
+    return H
+
+
+class KeplerOrbits:
+    """Элементы кеплеровых орбит планет и спутников хранилища **state**
+    на момент времени **epoch**.
+    """
+
+    def __init__(self, state, epoch):
+        self.state = state
+        self.epoch = epoch
+        self.levels = state.levels()[1:]
+
+        n = state.n
+        self.a = np.zeros(n)
+        self.e = np.zeros(n)
+        self.omega = np.zeros(n)
+        self.M0 = np.zeros(n)
+        self.mean_motion = np.zeros(n)
+        self.direction = np.ones(n)
+        self.valid = np.zeros(n, dtype=bool)
+        self.rx = np.zeros(n)
+        self.ry = np.zeros(n)
+
+        for idx in self.levels:
+            self._elements(idx)
+
+    @classmethod
+    def from_columns(cls, state, epoch, columns):
+        """Восстанавливает орбиты по ранее вычисленным столбцам элементов."""
+        orbits = cls.__new__(cls)
+        orbits.state = state
+        orbits.epoch = epoch
+        orbits.levels = state.levels()[1:]
+        for name, column in columns.items():
+            setattr(orbits, name, column)
+        return orbits
+
+    def _elements(self, idx):
+        state = self.state
+        parent = state.parent[idx]
+        rx = state.x[idx] - state.x[parent]
+        ry = state.y[idx] - state.y[parent]
+        vx = state.Vx[idx] - state.Vx[parent]
+        vy = state.Vy[idx] - state.Vy[parent]
+        mu = gravitational_constant * (state.m[parent] + state.m[idx])
+
+        r = np.hypot(rx, ry)
+        v2 = vx ** 2 + vy ** 2
+        h = rx * vy - ry * vx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = -mu / (2 * (v2 / 2 - mu / r))
+            rv = rx * vx + ry * vy
+            ex = ((v2 - mu / r) * rx - rv * vx) / mu
+            ey = ((v2 - mu / r) * ry - rv * vy) / mu
+        e = np.hypot(ex, ey)
+        valid = (mu > 0) & (r > 0) & (h != 0) & np.isfinite(a) & np.isfinite(e) & (np.abs(e - 1) > 1e-9)
+
+        omega = np.arctan2(ey, ex)
+        direction = np.where(h < 0, -1.0, 1.0)
+        nu = direction * (np.arctan2(ry, rx) - omega)
+
+        elliptic = valid & (e < 1)
+        hyperbolic = valid & (e > 1)
+        M0 = np.zeros(len(idx))
+        mean_motion = np.zeros(len(idx))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            E = 2 * np.arctan(np.sqrt((1 - e) / (1 + e)) * np.tan(nu / 2))
+            M0 = np.where(elliptic, E - e * np.sin(E), M0)
+            H = 2 * np.arctanh(np.sqrt((e - 1) / (e + 1)) * np.tan(nu / 2))
+            M0 = np.where(hyperbolic, e * np.sinh(H) - H, M0)
+            mean_motion = np.where(valid, np.sqrt(mu / np.abs(a) ** 3), 0.0)
+
+        self.a[idx] = a
+        self.e[idx] = e
+        self.omega[idx] = omega
+        self.M0[idx] = M0
+        self.mean_motion[idx] = mean_motion
+        self.direction[idx] = direction
+        self.valid[idx] = valid & np.isfinite(M0)
+        self.rx[idx] = rx
+        self.ry[idx] = ry
+
+    def relative_state(self, idx, time):
+        """Положение и скорость тел **idx** относительно родителей
+        через **time** секунд после эпохи.
+        """
+        a = np.abs(self.a[idx])
+        e = self.e[idx]
+        n = self.mean_motion[idx]
+        M = self.M0[idx] + n * time
+        valid = self.valid[idx]
+        elliptic = valid & (e < 1)
+        hyperbolic = valid & (e > 1)
+
+        px = np.zeros(len(idx))
+        py = np.zeros(len(idx))
+        pvx = np.zeros(len(idx))
+        pvy = np.zeros(len(idx))
+
+        if elliptic.any():
+            ee = e[elliptic]
+            Mw = np.remainder(M[elliptic] + np.pi, 2 * np.pi) - np.pi
+            E = solve_elliptic(Mw, ee)
+            cos_E = np.cos(E)
+            sin_E = np.sin(E)
+            root = np.sqrt(1 - ee ** 2)
+            rate = n[elliptic] / (1 - ee * cos_E)
+            px[elliptic] = a[elliptic] * (cos_E - ee)
+            py[elliptic] = a[elliptic] * root * sin_E
+            pvx[elliptic] = -a[elliptic] * sin_E * rate
+            pvy[elliptic] = a[elliptic] * root * cos_E * rate
+
+        if hyperbolic.any():
+            eh = e[hyperbolic]
+            H = solve_hyperbolic(M[hyperbolic], eh)
+            cosh_H = np.cosh(H)
+            sinh_H = np.sinh(H)
+            root = np.sqrt(eh ** 2 - 1)
+            rate = n[hyperbolic] / (eh * cosh_H - 1)
+            px[hyperbolic] = a[hyperbolic] * (eh - cosh_H)
+            py[hyperbolic] = a[hyperbolic] * root * sinh_H
+            pvx[hyperbolic] = -a[hyperbolic] * sinh_H * rate
+            pvy[hyperbolic] = a[hyperbolic] * root * cosh_H * rate
+
+        direction = self.direction[idx]
+        py *= direction
+        pvy *= direction
+        cos_w = np.cos(self.omega[idx])
+        sin_w = np.sin(self.omega[idx])
+        rx = np.where(valid, px * cos_w - py * sin_w, self.rx[idx])
+        ry = np.where(valid, px * sin_w + py * cos_w, self.ry[idx])
+        vx = np.where(valid, pvx * cos_w - pvy * sin_w, 0.0)
+        vy = np.where(valid, pvx * sin_w + pvy * cos_w, 0.0)
+        return rx, ry, vx, vy
+
+    def propagate(self, t):
+        """Переносит планеты и спутники хранилища на момент **t**:
+        уровень за уровнем, чтобы дети отсчитывались от уже перенесённых родителей.
+        """
+        state = self.state
+        for idx in self.levels:
+            if not len(idx):
+                continue
+            rx, ry, vx, vy = self.relative_state(idx, t - self.epoch)
+            parent = state.parent[idx]
+            state.x[idx] = state.x[parent] + rx
+            state.y[idx] = state.y[parent] + ry
+            state.Vx[idx] = state.Vx[parent] + vx
+            state.Vy[idx] = state.Vy[parent] + vy
+            state.orbit_angle[idx] = np.arctan2(ry, rx)
@@ -0,0 +1,82 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Иерархический (блочный) шаг по времени для свободных тел.
+Каждое тело получает собственный шаг dt / 2**k (k — «ступень»), выбранный
+по его ускорению и расстоянию до ближайшего соседа r_i:
+dt_i = eta * sqrt(r_i / |a_i|) — время, за которое тело с таким ускорением
+сдвигается на долю расстояния до соседа. Расстояние не берётся меньше
+gravity.min_distance: ближе силы всё равно ограничены.
+Тела на медленных ступенях получают толчки и пересчёт сил реже, чем тела
+на быстрых, поэтому общая работа за шаг определяется в основном быстрыми
+телами, а не их числом.
+Планеты и спутники движутся по орбитам в замкнутой форме, которая точна
+при любом шаге, поэтому их уровни дерева обновляются один раз за внешний шаг.
+"""
+
+import numpy as np
+
+from barnes_hut import QuadTree
+from gravity import min_distance
+from integrators import keep_acceleration, start_acceleration
+
+
+def neighbour_distances(state, idx):
+    """Расстояния от тел **idx** до ближайшего другого тела системы
+    (бесконечность, если других тел нет).
+    """
+    x = state.x[idx]
+    y = state.y[idx]
+    nearest = QuadTree(state.x, state.y, state.m).nearest(x, y, exclude=idx)
+    distance = np.hypot(x - state.x[nearest], y - state.y[nearest])
+    distance[nearest == idx] = np.inf
+    return distance
+
+
+def rungs(distance, ax, ay, dt, eta, max_rung):
+    """Номера ступеней k (шаг dt / 2**k) для тел с расстояниями до соседей
+    **distance** и ускорениями **ax**, **ay**.
+    """
+    acceleration = np.hypot(ax, ay)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        own_dt = eta * np.sqrt(np.maximum(distance, min_distance) / acceleration)
+        rung = np.ceil(np.log2(dt / own_dt))
+    rung = np.nan_to_num(rung, nan=0.0, posinf=max_rung, neginf=0.0)
+    return np.clip(rung, 0, max_rung).astype(np.int64)
+
+
+def hierarchical_leapfrog(state, idx, dt, acceleration, eta=0.1, max_rung=10):
+    """Схема kick-drift-kick с блочными шагами, интерфейс как у интеграторов
+    из модуля integrators. Ускорения конца шага переходят в начало следующего.
+
+    Параметры:
+
+    **eta** — коэффициент точности в выборе шага тела.
+    **max_rung** — наибольшая ступень, т. е. шаг не меньше dt / 2**max_rung.
+    """
+    if not len(idx):
+        return
+    ax, ay = start_acceleration(state, idx, acceleration)
+    rung = rungs(neighbour_distances(state, idx), ax, ay, dt, eta, max_rung)
+    top = int(rung.max())
+    h = dt / 2 ** top
+    stride = 2 ** (top - rung)
+    half_step = stride * h / 2
+
+    for substep in range(2 ** top):
+        starting = substep % stride == 0
+        bodies = idx[starting]
+        state.Vx[bodies] += ax[starting] * half_step[starting]
+        state.Vy[bodies] += ay[starting] * half_step[starting]
+
+        state.x[idx] += state.Vx[idx] * h
+        state.y[idx] += state.Vy[idx] * h
+
+        ending = (substep + 1) % stride == 0
+        bodies = idx[ending]
+        ax[ending], ay[ending] = acceleration(bodies)
+        state.Vx[bodies] += ax[ending] * half_step[ending]
+        state.Vy[bodies] += ay[ending] * half_step[ending]
+
+    # На последнем подшаге ускорения пересчитаны у всех тел — их можно взять в начало следующего шага
+    keep_acceleration(state, idx, ax, ay)
@@ -1,40 +1,115 @@
 # coding: utf-8
 # license: GPLv3
 
+import gc
+import itertools
+import os
 import re
 
+from solar_io import format_numbers
 from space_objects import *
 
+type_pattern = re.compile(r"Star|Planet|Satellite")
+"""Тип объекта — первое вхождение одного из этих слов в строку"""
+
+object_classes = {"Star": Star, "Planet": Planet, "Satellite": Satellite}
+"""Классы объектов по названию типа"""
+
+
+def object_class(name, line):
+    """Класс объекта строки **line** с первым словом **name** или None для неизвестного типа.
+    Обычно название объекта — это тип с номером, и регулярное выражение не нужно.
+    """
+    cls = object_classes.get(name.rstrip("0123456789_"))
+    if cls is not None:
+        return cls
+    for type_name, cls in object_classes.items():
+        if name.startswith(type_name):
+            return cls
+    match = type_pattern.search(line)
+    return object_classes[match.group()] if match else None
+
+
 class Parser:
     def read_space_objects_data_from_file(self, input_filename):
         """Читает данные о космических объектах из файла, создаёт сами объекты
         и вызывает создание их графических образов
 
+        Файл читается кусками (см. read_space_objects_chunks), каждый кусок
+        разбивается на слова за один проход, числовые
+        столбцы переводятся в числа сразу для всех строк, а родители находятся
+        по словарю имён, так что время чтения растёт линейно с числом объектов.
+        Родителем становится первый из объектов с этим именем, описанных выше.
+
         Параметры:
 
         **input_filename** — имя входного файла
         """
 
         objects = []
-        with open(input_filename) as input_file:
-            for line in input_file:
-                if len(line.strip()) == 0 or line[0] == '#':
-                    continue  # пустые строки и строки-комментарии пропускаем
-                match = re.search(r"Star|Planet|Satellite", line)
-                if match.group() == "Star":
-                    star = Star()
-                    self.parse_obj_parameters(line, star)
-                    objects.append(star)
-                elif match.group() == "Planet":
-                    planet = Planet()
-                    self.parse_obj_parameters(line, planet, objects)
-                    objects.append(planet)
-                elif match.group() == "Satellite":
-                    satellite = Satellite()
-                    self.parse_obj_parameters(line, satellite, objects)
-                    objects.append(satellite)
-                else:
-                    print("Unknown space object")
+        for chunk, fraction in self.read_space_objects_chunks(input_filename):
+            objects.extend(chunk)
+        return objects
+
+    def read_space_objects_chunks(self, input_filename, chunk_size=100000):
+        """Читает файл кусками по **chunk_size** строк и выдаёт их по мере чтения:
+        пары (объекты куска, доля прочитанного файла). Файл целиком в памяти
+        не держится; словарь имён общий для всех кусков, так что родитель может
+        быть описан в любом из предыдущих.
+
+        Параметры:
+
+        **input_filename** — имя входного файла
+        **chunk_size** — число строк в куске
+        """
+        size = os.path.getsize(input_filename) or 1
+        consumed = 0
+        names = {}
+        with open(input_filename, 'rb') as input_file:
+            while True:
+                lines = list(itertools.islice(input_file, chunk_size))
+                if not lines:
+                    return
+                consumed += sum(map(len, lines))
+                # Сборщик циклов при создании миллионов списков и объектов срабатывает тысячи раз впустую
+                collecting = gc.isenabled()
+                gc.disable()
+                try:
+                    objects = self._read_objects(b"".join(lines).decode().splitlines(), names)
+                finally:
+                    if collecting:
+                        gc.enable()
+                yield objects, consumed / size
+
+    def _read_objects(self, lines, names):
+        """Объекты по строкам **lines**; родители ищутся и новые объекты
+        записываются в словарь имён **names**.
+        """
+        lines = [line for line in lines
+                 if len(line.strip()) != 0 and line[0] != '#']  # пустые строки и строки-комментарии пропускаем
+        rows = []
+        classes = []
+        for line in lines:
+            words = line.split()
+            cls = object_class(words[0], line)
+            if cls is None:
+                print("Unknown space object")
+                continue
+            rows.append(words)
+            classes.append(cls)
+
+        radii = list(map(int, [words[1] for words in rows]))
+        masses, xs, ys, Vxs, Vys = (list(map(float, [words[k] for words in rows])) for k in range(3, 8))
+
+        objects = []
+        for k, words in enumerate(rows):
+            obj = unbound_object(classes[k], {
+                "name": words[0], "r": radii[k], "color": words[2], "m": masses[k],
+                "x": xs[k], "y": ys[k], "Vx": Vxs[k], "Vy": Vys[k]})
+            if len(words) == 9 and words[8] in names:
+                obj.parentPlanet = names[words[8]]
+            names.setdefault(words[0], obj)
+            objects.append(obj)
         return objects
 
 
@@ -72,20 +147,29 @@ class Parser:
                     obj.parentPlanet = i
                     break
 
-    def write_space_objects_data_to_file(self, output_filename, space_objects):
+    def write_space_objects_data_to_file(self, output_filename, space_objects, compact=False, block_size=65536):
         """Сохраняет данные о космических объектах в файл.
         Строки должны иметь следующий формат:
         Star <радиус в пикселах> <цвет> <масса> <x> <y> <Vx> <Vy>
         Planet <радиус в пикселах> <цвет> <масса> <x> <y> <Vx> <Vy>
 
+        Объекты пишутся блоками по **block_size**: столбцы блока переводятся
+        в текст целиком, и блок уходит в файл одним вызовом write.
+
         Параметры:
 
         **output_filename** — имя входного файла
         **space_objects** — список объектов планет и звёзд
+        **compact** — писать числа с solar_io.compact_digits значащими цифрами
         """
         with open(output_filename, 'w') as out_file:
-            for obj in space_objects:
-                print(f"{obj.name} {obj.r} {obj.color} {obj.m} {obj.x} {obj.y} {obj.Vx} {obj.Vy}\n", file=out_file)
+            for start in range(0, len(space_objects), block_size):
+                objects = space_objects[start:start + block_size]
+                columns = [[obj.name for obj in objects], [str(obj.r) for obj in objects],
+                           [str(obj.color) for obj in objects]]
+                columns += [format_numbers([getattr(obj, name) for obj in objects], compact)
+                            for name in ('m', 'x', 'y', 'Vx', 'Vy')]
+                out_file.write("".join(line + "\n" for line in map(" ".join, zip(*columns))))
 
 
     def write_statistics_to_file(self, output_filename, stats_history):
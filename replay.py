@@ -0,0 +1,134 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Воспроизведение записанного моделирования без пересчёта физики.
+Файл кадров без сжатия (.frames) отображается в память целиком: читаются
+только страницы показываемых кадров, поэтому размер файла может намного
+превышать объём памяти. Сжатый файл траекторий (.trj) распаковывается
+по кускам, в памяти держится только текущий кусок.
+
+Между сохранёнными кадрами положения интерполируются кубическим
+многочленом Эрмита по координатам и скоростям на концах промежутка,
+скорости — линейно.
+"""
+
+import os
+
+import numpy as np
+
+from trajectory import (TrajectoryReader, frames_header, frames_magic, magic, quantities,
+                        version)
+
+
+def hermite(frame0, frame1, h, s):
+    """Состояние в доле **s** промежутка длиной **h** секунд между кадрами
+    **frame0** и **frame1** (x, y, Vx, Vy): положения по кубическому многочлену
+    Эрмита, скорости линейно.
+    """
+    x0, y0, vx0, vy0 = frame0
+    x1, y1, vx1, vy1 = frame1
+    h00 = (1 + 2 * s) * (1 - s) ** 2
+    h10 = s * (1 - s) ** 2
+    h01 = s * s * (3 - 2 * s)
+    h11 = s * s * (s - 1)
+    x = h00 * x0 + h10 * h * vx0 + h01 * x1 + h11 * h * vx1
+    y = h00 * y0 + h10 * h * vy0 + h01 * y1 + h11 * h * vy1
+    return x, y, vx0 + s * (vx1 - vx0), vy0 + s * (vy1 - vy0)
+
+
+class FrameFile:
+    """Кадры файла без сжатия, отображённые в память."""
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as in_file:
+            file_magic, file_version, self.n = frames_header.unpack(in_file.read(frames_header.size))
+        if file_version != version:
+            raise ValueError(f"Неподдерживаемая версия файла кадров: {file_version}")
+        width = 1 + len(quantities) * self.n
+        count = (os.path.getsize(filename) - frames_header.size) // (8 * width)
+        if count:
+            self.frames = np.memmap(filename, dtype=np.float64, mode='r', offset=frames_header.size,
+                                    shape=(count, width))
+        else:
+            self.frames = np.zeros((0, width))
+        self.times = self.frames[:, 0]
+
+    def frame(self, k):
+        return self.frames[k, 1:].reshape(len(quantities), self.n)
+
+
+class ChunkedFrames:
+    """Кадры сжатого файла траекторий; распакованным держится один кусок."""
+
+    def __init__(self, filename):
+        self.reader = TrajectoryReader(filename)
+        self.n = self.reader.n
+        counts = [chunk[0] for chunk in self.reader.chunks]
+        self.chunk_start = np.concatenate(([0], np.cumsum(counts)))
+        self.times = self.reader.times()
+        self._cached = None
+
+    def frame(self, k):
+        number = int(np.searchsorted(self.chunk_start, k, side='right')) - 1
+        if self._cached is None or self._cached[0] != number:
+            self._cached = number, self.reader.chunk(number)[1]
+        return self._cached[1][:, k - self.chunk_start[number]]
+
+
+def open_frames(filename):
+    """Источник кадров по сигнатуре файла."""
+    with open(filename, 'rb') as in_file:
+        file_magic = in_file.read(len(magic))
+    if file_magic == frames_magic:
+        return FrameFile(filename)
+    if file_magic == magic:
+        return ChunkedFrames(filename)
+    raise ValueError(f"{filename} не является записью моделирования")
+
+
+class Replay:
+    """Воспроизведение записи из файла **filename** (.frames или .trj)."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.source = open_frames(filename)
+        self.n = self.source.n
+        self.times = self.source.times
+        if not len(self.times):
+            raise ValueError(f"В {filename} нет ни одного кадра")
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def start(self):
+        return float(self.times[0])
+
+    @property
+    def end(self):
+        return float(self.times[-1])
+
+    def frame(self, k):
+        """Сохранённый кадр **k**: массивы x, y, Vx, Vy."""
+        return tuple(self.source.frame(k))
+
+    def at(self, time):
+        """Состояние в момент **time**, интерполированное между соседними кадрами.
+        Вне записанного промежутка возвращается крайний кадр.
+        """
+        k = int(np.searchsorted(self.times, time, side='right')) - 1
+        if k < 0:
+            return self.frame(0)
+        if k >= len(self.times) - 1:
+            return self.frame(len(self.times) - 1)
+        t0 = self.times[k]
+        h = self.times[k + 1] - t0
+        if h <= 0:
+            return self.frame(k)
+        return hermite(self.source.frame(k), self.source.frame(k + 1), h, (time - t0) / h)
+
+    def apply(self, state, time):
+        """Записывает в хранилище **state** состояние в момент **time**."""
+        if state.n != self.n:
+            raise ValueError(f"В записи {self.n} тел, а в системе {state.n}")
+        state.x[:], state.y[:], state.Vx[:], state.Vy[:] = self.at(time)
@@ -0,0 +1,114 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Моделирование в отдельном потоке, независимо от отрисовки окна.
+Поток шагает модель так быстро, как позволяет процессор, и после каждого
+шага публикует снимок системы (время, x, y, Vx, Vy). Снимок пишется в задний
+буфер, после чего под блокировкой задний буфер и старший из двух опубликованных
+меняются местами; читателю всегда доступны два последних целых снимка.
+Окно с постоянной частотой кадров рисует положения, интерполированные между
+ними кубическим многочленом Эрмита (как в replay), так что медленная
+отрисовка не тормозит расчёт, а редкие шаги больших систем не дёргают картинку.
+
+Пока поток работает, модель принадлежит ему. Менять модель из окна можно
+только внутри hold(), между шагами.
+
+Операции NumPy над большими массивами отпускают GIL, поэтому для больших систем
+расчёт и отрисовка идут параллельно, а малые системы хотя бы не ждут таймера окна.
+"""
+
+import contextlib
+import threading
+import time
+
+import numpy as np
+
+from replay import hermite
+
+
+class SimulationThread:
+    """Поток, который шагает модель **model** по **dt** секунд, пока его не остановят.
+    Шаг dt можно менять на ходу.
+    """
+
+    def __init__(self, model, dt):
+        self.model = model
+        self.dt = dt
+        self.steps = 0
+        self.error = None
+        self.started = time.perf_counter()
+        self._step_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._back = None
+        self._front = None
+        self.publish()
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self._thread.start()
+
+    def _snapshot(self, buffer):
+        state = self.model.ensure_state()
+        if buffer is None or buffer.shape[1] != state.n:
+            buffer = np.empty((4, state.n))
+        buffer[0] = state.x
+        buffer[1] = state.y
+        buffer[2] = state.Vx
+        buffer[3] = state.Vy
+        return self.model.physical_time, time.perf_counter(), buffer
+
+    def publish(self):
+        """Публикует текущее состояние модели как оба последних снимка.
+        Вызывается из потока окна только внутри hold().
+        """
+        snapshot = self._snapshot(None)
+        with self._lock:
+            self._front = snapshot, snapshot
+            self._back = None
+
+    @contextlib.contextmanager
+    def hold(self):
+        """Приостанавливает расчёт между шагами, чтобы окно могло прочитать
+        или изменить модель; на выходе снимки заменяются текущим состоянием.
+        """
+        with self._step_lock:
+            yield self.model
+            self.publish()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                with self._step_lock:
+                    self.model.recalculate_positions(self.dt)
+                    self.steps += 1
+                    snapshot = self._snapshot(self._back)
+                    with self._lock:
+                        previous, latest = self._front
+                        self._front = latest, snapshot
+                        self._back = previous[2] if previous[2] is not latest[2] else None
+        except Exception as error:
+            self.error = error
+
+    def interpolated(self, now=None):
+        """Время и положения x, y тел для показа в момент **now** (по perf_counter).
+        Показ отстаёт на один шаг: за время между двумя последними снимками
+        картинка проходит путь от предпоследнего к последнему.
+        """
+        if now is None:
+            now = time.perf_counter()
+        with self._lock:
+            (t0, wall0, frame0), (t1, wall1, frame1) = self._front
+            if frame0 is frame1 or wall1 <= wall0 or frame0.shape != frame1.shape or t1 == t0:
+                return t1, frame1[0].copy(), frame1[1].copy()
+            s = min(1.0, max(0.0, (now - wall1) / (wall1 - wall0)))
+            x, y, Vx, Vy = hermite(frame0, frame1, t1 - t0, s)
+        return t0 + s * (t1 - t0), x, y
+
+    def rate(self):
+        """Среднее число шагов в секунду с запуска потока."""
+        elapsed = time.perf_counter() - self.started
+        return self.steps / elapsed if elapsed > 0 else 0.0
+
+    def stop(self):
+        """Останавливает поток и дожидается конца текущего шага."""
+        self._stop.set()
+        self._thread.join()
@@ -1,16 +1,30 @@
+import contextlib
+import queue
+import threading
+import time
 import tkinter
 from tkinter.filedialog import *
-from solar_model import SolarSystemModel, gravitational_constant
-from solar_objects import Star, Planet, Satellite
+import numpy as np
+from solar_model import SolarSystemModel
+from integrators import integrators
+from solar_io import stream_space_objects, write_space_objects
+import checkpoint
+from frame_profiler import FrameProfiler, overlay_tag
+from replay import Replay
+from simulation_thread import SimulationThread
+from trajectory import extension as trajectory_extension, frames_extension
+from solar_generator import generate_solar_system
 from solar_view import SolarSystemView, window_width, window_height
-import math
-import random
+
+display_interval = 0.033
+"""Промежуток между кадрами окна при расчёте в отдельном потоке, с"""
 
 
 class SolarSystemController:
     def __init__(self, root):
         self.root = root
         self.model = SolarSystemModel()
+        self.model.use_arrays = True
         self.view = SolarSystemView(root, self.model)
 
         self.perform_execution = False
@@ -18,6 +32,15 @@ class SolarSystemController:
         self.time_step.set(1000000)
         self.displayed_time = tkinter.StringVar()
         self.displayed_time.set("0.0 seconds gone")
+        self.replay = None
+        self.replay_time = 0.0
+        self.replay_position = tkinter.DoubleVar()
+        self.profiler = FrameProfiler(("physics", "bodies", "orbits", "overlay", "update"))
+        self.show_profiler = tkinter.BooleanVar()
+        self.loading = None
+        self.load_progress = tkinter.StringVar()
+        self.threaded = tkinter.BooleanVar()
+        self.simulation = None
 
         self.create_ui()
 
@@ -47,132 +70,189 @@ class SolarSystemController:
         orbit_button = tkinter.Button(frame, text="Toggle Orbits", command=self.toggle_orbits)
         orbit_button.pack(side=tkinter.LEFT)
 
+        replay_button = tkinter.Button(frame, text="Open Replay", command=self.open_replay_dialog)
+        replay_button.pack(side=tkinter.LEFT)
+
+        profiler_check = tkinter.Checkbutton(frame, text="Profiler", variable=self.show_profiler,
+                                             command=self.toggle_profiler)
+        profiler_check.pack(side=tkinter.LEFT)
+
+        profile_button = tkinter.Button(frame, text="Save Profile", command=self.save_profile_dialog)
+        profile_button.pack(side=tkinter.LEFT)
+
+        threaded_check = tkinter.Checkbutton(frame, text="Threaded", variable=self.threaded)
+        threaded_check.pack(side=tkinter.LEFT)
+
+        self.integrator = tkinter.StringVar()
+        self.integrator.set(self.model.integrator)
+        integrator_menu = tkinter.OptionMenu(frame, self.integrator, *integrators, command=self.select_integrator)
+        integrator_menu.pack(side=tkinter.LEFT)
+
         time_label = tkinter.Label(frame, textvariable=self.displayed_time, width=30)
         time_label.pack(side=tkinter.RIGHT)
 
+        progress_label = tkinter.Label(frame, textvariable=self.load_progress, width=14)
+        progress_label.pack(side=tkinter.RIGHT)
+
+        self.replay_scale = tkinter.Scale(self.root, variable=self.replay_position, orient=tkinter.HORIZONTAL,
+                                          showvalue=False, length=window_width, command=self.seek_replay)
+
     def execution(self):
         if not self.perform_execution:
             return
 
-        self.view.space.delete("all")
-        self.model.recalculate_positions(self.time_step.get())
-
-        for body in self.model.space_objects:
-            if body.type == 'star':
-                self.view.create_star_image(body)
-            else:
-                self.view.create_planet_image(body)
-
-        if self.view.show_orbits:
-            self.view.draw_orbits()
+        profiler = self.profiler
+        profiler.begin_frame()
+        if self.replay is not None:
+            self.replay_time = min(self.replay_time + self.time_step.get(), self.replay.end)
+            self.replay_position.set(self.replay_time)
+            self.show_replay_frame()
+        else:
+            self.model.recalculate_positions(self.time_step.get())
+        profiler.mark("physics")
 
+        self.draw_frame()
         self.displayed_time.set(f"{self.model.physical_time:.1f} seconds gone")
         self.view.space.update_idletasks()
         self.view.space.update()
+        profiler.mark("update")
+        profiler.end_frame()
         self.view.space.after(50, self.execution)
 
+    def draw_frame(self):
+        """Тела, орбиты и сводка профилировщика для текущего кадра."""
+        profiler = self.profiler
+        self.view.draw_bodies()
+        profiler.mark("bodies")
+
+        if self.view.show_orbits:
+            self.view.draw_orbits()
+        profiler.mark("orbits")
+
+        if self.show_profiler.get():
+            profiler.draw_overlay(self.view.space, window_width - 10, 10)
+        profiler.mark("overlay")
+
+    def render_frame(self):
+        """Кадр окна при расчёте в отдельном потоке (SimulationThread): рисует
+        положения тел, интерполированные между последними снимками модели,
+        и назначает следующий кадр через display_interval от начала этого.
+        """
+        simulation = self.simulation
+        if simulation is None:
+            return
+        if simulation.error is not None:
+            error = simulation.error
+            self.stop_execution()
+            tkinter.messagebox.showerror("Error", f"Simulation failed: {error}")
+            return
+
+        profiler = self.profiler
+        profiler.begin_frame()
+        start = time.perf_counter()
+        simulation.dt = self.time_step.get()
+        physical_time, x, y = simulation.interpolated(start)
+        self.view.positions = x, y
+        profiler.mark("physics")
+
+        self.draw_frame()
+        self.displayed_time.set(f"{physical_time:.1f} seconds gone, {simulation.rate():.0f} steps/s")
+        profiler.mark("update")
+        profiler.end_frame()
+        delay = display_interval - (time.perf_counter() - start)
+        self.view.space.after(max(1, int(delay * 1000)), self.render_frame)
+
     def start_execution(self):
         self.perform_execution = True
         self.start_button['text'] = "Pause"
         self.start_button['command'] = self.stop_execution
-        self.execution()
+        if self.threaded.get() and self.replay is None:
+            self.simulation = SimulationThread(self.model, self.time_step.get())
+            self.render_frame()
+        else:
+            self.execution()
 
     def stop_execution(self):
         self.perform_execution = False
         self.start_button['text'] = "Start"
         self.start_button['command'] = self.start_execution
+        self.stop_simulation()
 
-    def generate_solar_system(self):
-        self.model.space_objects = []
-        star_positions = [(-300e9, 0), (0, 0), (300e9, 0)]
-        star_colors = ["yellow", "red", "blue"]
-        planet_counts = [10, 20, 10]
-
-        for i in range(3):
-            star = Star(*star_positions[i], color=star_colors[i])
-            star.m = 1.98892E30 * random.uniform(0.9, 1.1)
-            star.R = 15
-            self.model.space_objects.append(star)
-
-            num_planets = planet_counts[i]
-            orbits_needed = math.ceil(num_planets / 4)  # Max 4 planets per orbit
-
-            # Генерируем наклонения для каждой орбиты (в радианах)
-            inclinations = [random.uniform(-0.2, 0.2) for _ in range(orbits_needed)]
-
-            for orbit_num in range(1, orbits_needed + 1):
-                planets_in_orbit = min(4, num_planets - (orbit_num - 1) * 4)
-
-                # Разные радиусы для планет на одной орбите (чтобы избежать точного совпадения)
-                base_orbit_radius = 50e9 * orbit_num
-                orbit_radii = [base_orbit_radius * (1 + 0.05 * j) for j in range(planets_in_orbit)]
-
-                # Разные наклонения для планет на одной орбите
-                orbit_inclination = inclinations[orbit_num - 1]
-                planet_inclinations = [orbit_inclination + random.uniform(-0.05, 0.05)
-                                       for _ in range(planets_in_orbit)]
-
-                for planet_idx in range(planets_in_orbit):
-                    planet = Planet()
-                    planet.parent_star = star
-                    planet.orbit_radius = orbit_radii[planet_idx]
-
-                    # Угол между планетами на одной орбите
-                    angle = 2 * math.pi * planet_idx / planets_in_orbit + random.uniform(-0.1, 0.1)
-                    planet.orbit_angle = angle
-
-                    # Рассчитываем 3D позицию (но проецируем на 2D)
-                    inclination = planet_inclinations[planet_idx]
-                    planet.x = star.x + planet.orbit_radius * math.cos(angle) * math.cos(inclination)
-                    planet.y = star.y + planet.orbit_radius * math.sin(angle) * math.cos(inclination)
-
-                    # Орбитальная скорость с учетом наклонения
-                    linear_speed = 10e3 / math.sqrt(orbit_num)
-                    planet.orbit_speed = linear_speed / planet.orbit_radius
-                    planet.clockwise = (orbit_num % 2 == 0)
-
-                    # Начальная скорость с учетом наклонения орбиты
-                    speed = linear_speed
-                    if planet.clockwise:
-                        planet.Vx = speed * math.sin(angle) * math.cos(inclination)
-                        planet.Vy = -speed * math.cos(angle) * math.cos(inclination)
-                    else:
-                        planet.Vx = -speed * math.sin(angle) * math.cos(inclination)
-                        planet.Vy = speed * math.cos(angle) * math.cos(inclination)
-
-                    planet.m = random.uniform(1e24, 1e26)
-                    planet.color = f"#{random.randint(50, 255):02x}{random.randint(50, 255):02x}{random.randint(50, 255):02x}"
-                    planet.R = random.randint(3, 8)
-                    self.model.space_objects.append(planet)
-
-                    # Добавляем спутники (с проверкой расстояний)
-                    if i == 1 and orbit_num % 2 == 1:
-                        satellite = Satellite()
-                        sat_orbit_radius = planet.R * 1e9 * random.uniform(0.8, 1.2)
-                        angle = random.uniform(0, 2 * math.pi)
-
-                        # Позиция спутника с небольшим случайным смещением
-                        satellite.x = planet.x + sat_orbit_radius * math.cos(angle) * random.uniform(0.9, 1.1)
-                        satellite.y = planet.y + sat_orbit_radius * math.sin(angle) * random.uniform(0.9, 1.1)
-
-                        satellite.orbit_radius = sat_orbit_radius
-                        orbital_speed = (gravitational_constant * planet.m / sat_orbit_radius) ** 0.5
-                        satellite.Vx = planet.Vx - orbital_speed * math.sin(angle)
-                        satellite.Vy = planet.Vy + orbital_speed * math.cos(angle)
-                        satellite.orbit_angle = angle
-                        satellite.orbit_speed = orbital_speed / sat_orbit_radius
-                        satellite.parent_planet = planet
-                        satellite.m = planet.m * 0.001
-                        satellite.R = planet.R * 0.3
-                        satellite.clockwise = True
-                        self.model.space_objects.append(satellite)
+    def stop_simulation(self):
+        """Останавливает поток моделирования; окно снова рисует саму модель."""
+        if self.simulation is None:
+            return
+        self.simulation.stop()
+        self.simulation = None
+        self.view.positions = None
+        self.displayed_time.set(f"{self.model.physical_time:.1f} seconds gone")
+        self.display_system()
+
+    def model_access(self):
+        """Контекст, в котором окну можно менять модель: пока работает поток
+        моделирования, он приостанавливается между шагами.
+        """
+        if self.simulation is None:
+            return contextlib.nullcontext()
+        return self.simulation.hold()
+
+    def open_replay_dialog(self):
+        """Открывает запись моделирования для текущей системы. Система должна
+        быть той же, что и при записи: запись хранит только координаты и скорости.
+        """
+        self.stop_execution()
+        filename = askopenfilename(filetypes=(("Recordings", "*" + frames_extension + " *" + trajectory_extension),
+                                              ("All files", "*.*")))
+        if not filename:
+            return
+        try:
+            replay = Replay(filename)
+            if self.model.ensure_state().n != replay.n:
+                raise ValueError(f"в записи {replay.n} тел — сначала откройте записанную систему")
+        except Exception as e:
+            tkinter.messagebox.showerror("Error", f"Failed to open the recording: {e}")
+            return
+        self.replay = replay
+        self.replay_time = replay.start
+        self.replay_scale.configure(from_=replay.start, to=replay.end,
+                                    resolution=(replay.end - replay.start) / max(1, 10 * len(replay)))
+        self.replay_position.set(replay.start)
+        self.replay_scale.pack(side=tkinter.BOTTOM)
+        self.show_replay_frame()
+        self.display_system()
+        self.view.update_system_name("Replay: " + filename)
+
+    def stop_replay(self):
+        """Выходит из режима воспроизведения: дальше модель снова считается."""
+        if self.replay is None:
+            return
+        self.replay = None
+        self.replay_scale.pack_forget()
+
+    def show_replay_frame(self):
+        """Переносит в модель кадр записи на момент replay_time."""
+        self.replay.apply(self.model.ensure_state(), self.replay_time)
+        self.model.physical_time = self.replay_time
+        self.displayed_time.set(f"{self.model.physical_time:.1f} seconds gone")
+
+    def seek_replay(self, value):
+        """Обработчик ползунка: переход к моменту **value** записи."""
+        if self.replay is None or float(value) == self.replay_time:
+            return
+        self.replay_time = float(value)
+        self.show_replay_frame()
+        self.display_system()
+
+    def generate_solar_system(self, seed=None):
+        self.model.space_objects = generate_solar_system(seed)
 
         max_distance = max(max(abs(obj.x), abs(obj.y)) for obj in self.model.space_objects)
         self.model.scale_factor = 0.4 * min(window_height, window_width) / max_distance
         return self.model.space_objects
     def open_file_dialog(self):
-        self.perform_execution = False
-        filename = askopenfilename(filetypes=(("Text files", "*.txt"), ("All files", "*.*")))
+        self.stop_execution()
+        filename = askopenfilename(filetypes=(("Text files", "*.txt"), ("Checkpoints", "*" + checkpoint.extension),
+                                              ("All files", "*.*")))
 
         if filename:
             success = self.load_from_file(filename)
@@ -183,136 +263,159 @@ class SolarSystemController:
                 tkinter.messagebox.showerror("Error", "Failed to load the file")
 
     def generate_system_dialog(self):
-        self.perform_execution = False
+        self.stop_execution()
+        self.stop_loading()
+        self.stop_replay()
         self.generate_solar_system()
         self.display_system()
         self.view.update_system_name("Generated Solar System")
 
     def display_system(self):
-        self.view.space.delete("all")
-        for obj in self.model.space_objects:
-            if obj.type == 'star':
-                self.view.create_star_image(obj)
-            elif obj.type in ['planet', 'satellite']:
-                self.view.create_planet_image(obj)
-
-        if self.view.show_orbits:
-            self.view.draw_orbits()
+        self.view.redraw_all()
 
     def save_file_dialog(self):
-        out_filename = asksaveasfilename(filetypes=(("Text file", ".txt"),))
-        if out_filename:
-            self.write_space_objects_data_to_file(out_filename)
+        out_filename = asksaveasfilename(filetypes=(("Text file", ".txt"), ("Checkpoint", checkpoint.extension)))
+        if not out_filename:
+            return
+        with self.model_access():
+            if out_filename.endswith(checkpoint.extension):
+                checkpoint.save_checkpoint(out_filename, self.model)
+            else:
+                self.write_space_objects_data_to_file(out_filename)
 
     def load_from_file(self, filename):
-        """Загружает солнечную систему из файла"""
+        """Загружает солнечную систему из файла. Текстовый файл читается
+        в фоне кусками (см. start_loading), так что метод возвращается сразу.
+        """
+        self.stop_loading()
+        self.stop_replay()
         self.model.space_objects = []
-        object_types = {'Star': Star, 'Planet': Planet, 'Satellite': Satellite}
 
         try:
-            with open(filename, 'r') as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-
-                    parts = line.split()
-                    obj_type = parts[0]
-                    if obj_type not in object_types:
-                        continue
-
-                    # Создаем объект
-                    obj = object_types[obj_type]()
-                    obj.R = float(parts[1])
-                    obj.color = parts[2]
-                    obj.m = float(parts[3])
-                    obj.x = float(parts[4])
-                    obj.y = float(parts[5])
-                    obj.Vx = float(parts[6])
-                    obj.Vy = float(parts[7])
-
-                    # Для планет и спутников устанавливаем родительские объекты
-                    if obj_type == 'Planet':
-                        # Находим ближайшую звезду как родительскую
-                        min_dist = float('inf')
-                        for potential_parent in self.model.space_objects:
-                            if potential_parent.type == 'star':
-                                dist = ((obj.x - potential_parent.x) ** 2 +
-                                        (obj.y - potential_parent.y) ** 2) ** 0.5
-                                if dist < min_dist:
-                                    min_dist = dist
-                                    obj.parent_star = potential_parent
-
-                        # Устанавливаем орбитальные параметры
-                        if obj.parent_star:
-                            dx = obj.x - obj.parent_star.x
-                            dy = obj.y - obj.parent_star.y
-                            obj.orbit_radius = (dx ** 2 + dy ** 2) ** 0.5
-                            obj.orbit_angle = math.atan2(dy, dx)
-
-                            # Вычисляем угловую скорость
-                            velocity_tangent = (-obj.Vx * dy + obj.Vy * dx) / obj.orbit_radius
-                            obj.orbit_speed = velocity_tangent / obj.orbit_radius
-                            obj.clockwise = velocity_tangent > 0
-
-                    elif obj_type == 'Satellite':
-                        # Находим ближайшую планету как родительскую
-                        min_dist = float('inf')
-                        for potential_parent in self.model.space_objects:
-                            if potential_parent.type == 'planet':
-                                dist = ((obj.x - potential_parent.x) ** 2 +
-                                        (obj.y - potential_parent.y) ** 2) ** 0.5
-                                if dist < min_dist:
-                                    min_dist = dist
-                                    obj.parent_planet = potential_parent
-
-                        # Устанавливаем орбитальные параметры
-                        if obj.parent_planet:
-                            dx = obj.x - obj.parent_planet.x
-                            dy = obj.y - obj.parent_planet.y
-                            obj.orbit_radius = (dx ** 2 + dy ** 2) ** 0.5
-                            obj.orbit_angle = math.atan2(dy, dx)
-
-                            # Вычисляем угловую скорость
-                            velocity_tangent = (-obj.Vx * dy + obj.Vy * dx) / obj.orbit_radius
-                            obj.orbit_speed = velocity_tangent / obj.orbit_radius
-                            obj.clockwise = velocity_tangent > 0
-
-                    self.model.space_objects.append(obj)
-
-            # Рассчитываем масштаб для отображения
-            max_distance = max(max(abs(obj.x), abs(obj.y)) for obj in self.model.space_objects) or 1e12
-            self.model.scale_factor = 0.4 * min(window_height, window_width) / max_distance
-
+            if filename.endswith(checkpoint.extension):
+                checkpoint.load_checkpoint(filename, self.model)
+                if self.model.scale_factor is None:
+                    # Контрольная точка потокового генератора масштаба не знает
+                    self.fit_scale()
+                return True
+
+            self.start_loading(filename)
             return True
 
         except Exception as e:
             print(f"Ошибка загрузки файла: {e}")
             return False
+
+    def fit_scale(self):
+        """Подбирает масштаб так, чтобы вся система помещалась в окне."""
+        state = self.model.ensure_state()
+        max_distance = max(np.abs(state.x).max(), np.abs(state.y).max()) if state.n else 0
+        self.model.scale_factor = 0.4 * min(window_height, window_width) / (max_distance or 1e12)
+
+    def start_loading(self, filename):
+        """Начинает потоковую загрузку системы из текстового файла: фоновый поток
+        читает файл кусками (solar_io.stream_space_objects) и складывает их
+        в очередь, а poll_loading по мере готовности добавляет их в модель.
+        Систему можно смотреть и запускать, не дожидаясь конца файла.
+        """
+        chunks = queue.Queue()
+        stop = threading.Event()
+        self.loading = filename, chunks, stop, self.model.physical_time
+        self.load_progress.set("Loading 0%")
+        threading.Thread(target=self._read_chunks, args=(filename, chunks, stop),
+                         name="system-loader", daemon=True).start()
+        self.view.space.after(50, self.poll_loading)
+
+    @staticmethod
+    def _read_chunks(filename, chunks, stop):
+        try:
+            for chunk in stream_space_objects(filename):
+                if stop.is_set():
+                    return
+                chunks.put(chunk)
+            chunks.put(None)
+        except Exception as error:
+            chunks.put(error)
+
+    def poll_loading(self):
+        """Добавляет в модель все прочитанные к этому моменту куски. Новые тела
+        описаны на момент начала загрузки, поэтому модель доводит их орбиты
+        до текущего времени (SolarSystemModel.append_objects).
+        """
+        if self.loading is None:
+            return
+        filename, chunks, stop, start_time = self.loading
+        objects = []
+        fraction = None
+        finished = False
+        while True:
+            try:
+                item = chunks.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, Exception):
+                self.stop_loading()
+                tkinter.messagebox.showerror("Error", f"Failed to load the file: {item}")
+                return
+            if item is None:
+                finished = True
+                break
+            objects.extend(item[0])
+            fraction = item[1]
+
+        if objects:
+            with self.model_access():
+                self.model.append_objects(objects, self.model.physical_time - start_time)
+                self.fit_scale()
+            self.load_progress.set(f"Loading {fraction:.0%}")
+            if not self.perform_execution:
+                self.display_system()
+        if finished:
+            self.loading = None
+            self.load_progress.set("")
+            self.view.update_system_name("Loaded from: " + filename)
+            return
+        self.view.space.after(100, self.poll_loading)
+
+    def stop_loading(self):
+        """Прерывает незаконченную потоковую загрузку."""
+        if self.loading is None:
+            return
+        self.loading[2].set()
+        self.loading = None
+        self.load_progress.set("")
+
     def write_space_objects_data_to_file(self, output_filename):
         """Сохраняет текущую систему в файл"""
-        with open(f'{output_filename}.txt', 'w') as out_file:
-            for obj in self.model.space_objects:
-                if isinstance(obj, Star):
-                    obj_type = "Star"
-                elif isinstance(obj, Planet):
-                    obj_type = "Planet"
-                elif isinstance(obj, Satellite):
-                    obj_type = "Satellite"
-                else:
-                    continue
-
-                out_file.write(
-                    f"{obj_type} {obj.R} {obj.color} {obj.m} {obj.x} {obj.y} {obj.Vx} {obj.Vy}\n"
-                )
+        if not output_filename.endswith('.txt'):
+            output_filename += '.txt'
+        write_space_objects(output_filename, self.model.ensure_state())
+
+    def toggle_profiler(self):
+        if self.show_profiler.get():
+            self.profiler.draw_overlay(self.view.space, window_width - 10, 10)
+        else:
+            self.view.space.delete(overlay_tag)
+
+    def save_profile_dialog(self):
+        """Сохраняет время фаз последних кадров в CSV."""
+        out_filename = asksaveasfilename(filetypes=(("CSV file", ".csv"),))
+        if out_filename:
+            self.profiler.write_csv(out_filename)
+
+    def select_integrator(self, name):
+        with self.model_access():
+            self.model.integrator = name
 
     def toggle_orbits(self):
         self.view.show_orbits = not self.view.show_orbits
         if not self.view.show_orbits:
-            self.view.space.delete("orbit")
+            self.view.hide_orbits()
         else:
             self.view.draw_orbits()
 
 
-root = tkinter.Tk()
-SolarSystemController(root)
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    root = tkinter.Tk()
+    SolarSystemController(root)
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,324 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Генерация случайных звёздных систем.
+Все случайные величины берутся из собственного генератора random.Random(seed),
+поэтому при одинаковом **seed** и параметрах получается одна и та же система.
+
+Для очень больших систем (до миллионов тел) есть потоковый генератор
+generate_blocks: звёзды идут блоками по block_stars, каждый блок строится
+векторно своим генератором numpy по (seed, номер блока), поэтому система
+определяется параметрами генератора и не зависит от того, куда и как
+потребитель пишет блоки. Блоки пишутся сразу
+в текстовый файл или контрольную точку (память не растёт с размером системы)
+либо собираются в хранилище SystemState.
+
+Запуск: python solar_generator.py --stars 40000 --planets 24 --satellites 1 --output big.ckpt
+"""
+
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+import checkpoint
+import solar_io
+from gravity import gravitational_constant
+from solar_state import PLANET, SATELLITE, STAR, SystemState, float_columns
+from space_objects import Star, Planet, Satellite
+
+star_colors = ["yellow", "red", "blue"]
+"""Цвета звёзд по порядку"""
+
+planet_colors = ["green", "cyan", "orange", "magenta", "gray", "brown", "pink", "gold"]
+"""Цвета планет потокового генератора"""
+
+satellite_color = "white"
+"""Цвет спутников потокового генератора"""
+
+palette = star_colors + planet_colors + [satellite_color]
+"""Все цвета потокового генератора; в блоках цвет задаётся номером в этом списке"""
+
+ring_spacing = 80e9
+"""Расстояние между соседними орбитами планет потокового генератора, м"""
+
+
+def generate_solar_system(seed=None, star_count=3, planet_counts=(10, 20, 10),
+                          satellite_stars=(1,), star_spacing=300e9):
+    """Создаёт звёзды в ряд вдоль оси x, вокруг каждой — планеты на орбитах
+    по 4 планеты, а у планет на нечётных орбитах звёзд из **satellite_stars** — спутники.
+    Возвращает список объектов.
+
+    Параметры:
+
+    **seed** — зерно генератора случайных чисел (None — случайное).
+    **star_count** — число звёзд.
+    **planet_counts** — числа планет у звёзд по порядку (повторяются по кругу) или одно число.
+    **satellite_stars** — номера звёзд, у планет которых есть спутники.
+    **star_spacing** — расстояние между соседними звёздами.
+    """
+    rng = random.Random(seed)
+    if isinstance(planet_counts, int):
+        planet_counts = (planet_counts,)
+    space_objects = []
+
+    for i in range(star_count):
+        star = Star((i - (star_count - 1) / 2) * star_spacing, 0, color=star_colors[i % len(star_colors)])
+        star.m = 1.98892E30 * rng.uniform(0.9, 1.1)
+        star.R = 15
+        space_objects.append(star)
+
+        num_planets = planet_counts[i % len(planet_counts)]
+        orbits_needed = math.ceil(num_planets / 4)  # Max 4 planets per orbit
+
+        # Генерируем наклонения для каждой орбиты (в радианах)
+        inclinations = [rng.uniform(-0.2, 0.2) for _ in range(orbits_needed)]
+
+        for orbit_num in range(1, orbits_needed + 1):
+            planets_in_orbit = min(4, num_planets - (orbit_num - 1) * 4)
+
+            # Разные радиусы для планет на одной орбите (чтобы избежать точного совпадения)
+            base_orbit_radius = 50e9 * orbit_num
+            orbit_radii = [base_orbit_radius * (1 + 0.05 * j) for j in range(planets_in_orbit)]
+
+            # Разные наклонения для планет на одной орбите
+            orbit_inclination = inclinations[orbit_num - 1]
+            planet_inclinations = [orbit_inclination + rng.uniform(-0.05, 0.05)
+                                   for _ in range(planets_in_orbit)]
+
+            for planet_idx in range(planets_in_orbit):
+                planet = Planet()
+                planet.parent_star = star
+                planet.orbit_radius = orbit_radii[planet_idx]
+
+                # Угол между планетами на одной орбите
+                angle = 2 * math.pi * planet_idx / planets_in_orbit + rng.uniform(-0.1, 0.1)
+                planet.orbit_angle = angle
+
+                # Рассчитываем 3D позицию (но проецируем на 2D)
+                inclination = planet_inclinations[planet_idx]
+                planet.x = star.x + planet.orbit_radius * math.cos(angle) * math.cos(inclination)
+                planet.y = star.y + planet.orbit_radius * math.sin(angle) * math.cos(inclination)
+
+                # Орбитальная скорость с учетом наклонения
+                linear_speed = 10e3 / math.sqrt(orbit_num)
+                planet.orbit_speed = linear_speed / planet.orbit_radius
+                planet.clockwise = (orbit_num % 2 == 0)
+
+                # Начальная скорость с учетом наклонения орбиты
+                speed = linear_speed
+                if planet.clockwise:
+                    planet.Vx = speed * math.sin(angle) * math.cos(inclination)
+                    planet.Vy = -speed * math.cos(angle) * math.cos(inclination)
+                else:
+                    planet.Vx = -speed * math.sin(angle) * math.cos(inclination)
+                    planet.Vy = speed * math.cos(angle) * math.cos(inclination)
+
+                planet.m = rng.uniform(1e24, 1e26)
+                planet.color = f"#{rng.randint(50, 255):02x}{rng.randint(50, 255):02x}{rng.randint(50, 255):02x}"
+                planet.R = rng.randint(3, 8)
+                space_objects.append(planet)
+
+                # Добавляем спутники (с проверкой расстояний)
+                if i in satellite_stars and orbit_num % 2 == 1:
+                    satellite = Satellite()
+                    sat_orbit_radius = planet.R * 1e9 * rng.uniform(0.8, 1.2)
+                    angle = rng.uniform(0, 2 * math.pi)
+
+                    # Позиция спутника с небольшим случайным смещением
+                    satellite.x = planet.x + sat_orbit_radius * math.cos(angle) * rng.uniform(0.9, 1.1)
+                    satellite.y = planet.y + sat_orbit_radius * math.sin(angle) * rng.uniform(0.9, 1.1)
+
+                    satellite.orbit_radius = sat_orbit_radius
+                    orbital_speed = (gravitational_constant * planet.m / sat_orbit_radius) ** 0.5
+                    satellite.Vx = planet.Vx - orbital_speed * math.sin(angle)
+                    satellite.Vy = planet.Vy + orbital_speed * math.cos(angle)
+                    satellite.orbit_angle = angle
+                    satellite.orbit_speed = orbital_speed / sat_orbit_radius
+                    satellite.parent_planet = planet
+                    satellite.m = planet.m * 0.001
+                    satellite.R = planet.R * 0.3
+                    satellite.clockwise = True
+                    space_objects.append(satellite)
+
+    return space_objects
+
+
+def body_count(star_count, planets_per_star, satellites_per_planet):
+    """Число тел в системе потокового генератора."""
+    return star_count * (1 + planets_per_star * (1 + satellites_per_planet))
+
+
+def planet_orbit_radii(planets_per_star):
+    """Радиусы орбит планет одной звезды: как в generate_solar_system, по 4 планеты
+    на орбиту, но планеты одной орбиты идут по одному радиусу (с одной угловой
+    скоростью, так что не догоняют друг друга), а орбиты отстоят на ring_spacing.
+    """
+    return ring_spacing * (np.arange(planets_per_star) // 4 + 1)
+
+
+def default_star_spacing(planets_per_star):
+    """Расстояние между звёздами, при котором планетные системы соседей не пересекаются."""
+    return 2.5 * planet_orbit_radii(max(1, planets_per_star)).max()
+
+
+def generate_blocks(seed=0, star_count=3, planets_per_star=20, satellites_per_planet=0,
+                    star_spacing=None, block_stars=256):
+    """Порождает систему блоками. Каждый блок — пара (индекс первого тела, словарь
+    столбцов хранилища с ключами checkpoint.state_columns и 'color' — номерами цветов
+    в palette). Тела каждой звезды идут подряд: звезда, затем каждая планета со
+    своими спутниками; индексы родителей сквозные по всей системе.
+
+    Параметры:
+
+    **seed** — зерно генератора.
+    **star_count** — число звёзд; звёзды стоят в узлах квадратной решётки.
+    **planets_per_star** — число планет у каждой звезды.
+    **satellites_per_planet** — число спутников у каждой планеты.
+    **star_spacing** — шаг решётки звёзд (по умолчанию default_star_spacing).
+    **block_stars** — число звёзд в блоке.
+    """
+    P, K = planets_per_star, satellites_per_planet
+    per_star = 1 + P * (1 + K)
+    if star_spacing is None:
+        star_spacing = default_star_spacing(P)
+    side = max(1, math.ceil(math.sqrt(star_count)))
+
+    # Шаблон тел одной звезды: коды типов, номера планет и родители внутри шаблона
+    planet_slot = 1 + np.arange(P) * (1 + K)
+    satellite_slot = (planet_slot[:, None] + 1 + np.arange(K)).ravel()
+    slot_planet = np.repeat(np.arange(P), K)
+    template_type = np.full(per_star, PLANET, dtype=np.int8)
+    template_type[0] = STAR
+    template_type[satellite_slot] = SATELLITE
+    template_parent = np.zeros(per_star, dtype=np.int64)
+    template_parent[0] = -1
+    template_parent[satellite_slot] = planet_slot[slot_planet]
+
+    radii = planet_orbit_radii(P)
+    orbit_num = np.arange(P) // 4 + 1
+    in_orbit = np.minimum(4, P - (orbit_num - 1) * 4)
+
+    for block, first_star in enumerate(range(0, star_count, block_stars)):
+        S = min(block_stars, star_count - first_star)
+        rng = np.random.default_rng([seed, block])
+        n = S * per_star
+        columns = {name: np.zeros(n) for name in float_columns}
+        columns['parent'] = np.full(n, -1, dtype=np.int64)
+        columns['type_code'] = np.tile(template_type, S)
+        columns['clockwise'] = np.ones(n, dtype=bool)
+        columns['color'] = np.zeros(n, dtype=np.uint32)
+        view = {name: column.reshape(S, per_star) for name, column in columns.items()}
+
+        stars = first_star + np.arange(S)
+        star_x = (stars % side - (side - 1) / 2) * star_spacing
+        star_y = (stars // side - (side - 1) / 2) * star_spacing
+        star_m = 1.98892E30 * rng.uniform(0.9, 1.1, S)
+        view['x'][:, 0] = star_x
+        view['y'][:, 0] = star_y
+        view['m'][:, 0] = star_m
+        view['R'][:, 0] = 15
+        view['color'][:, 0] = stars % len(star_colors)
+
+        base = first_star * per_star + np.arange(S)[:, None] * per_star
+        view['parent'][:, 1:] = base + template_parent[1:]
+
+        if P:
+            angle = 2 * np.pi * (np.arange(P) % 4) / in_orbit + rng.uniform(-0.1, 0.1, (S, P))
+            speed = np.sqrt(gravitational_constant * star_m[:, None] / radii)
+            clockwise = np.broadcast_to(orbit_num % 2 == 0, (S, P))
+            direction = np.where(clockwise, -1.0, 1.0)
+            px = star_x[:, None] + radii * np.cos(angle)
+            py = star_y[:, None] + radii * np.sin(angle)
+            pvx = -direction * speed * np.sin(angle)
+            pvy = direction * speed * np.cos(angle)
+            pm = rng.uniform(1e24, 1e26, (S, P))
+            pR = rng.integers(3, 9, (S, P)).astype(float)
+            for name, values in (('x', px), ('y', py), ('Vx', pvx), ('Vy', pvy), ('m', pm), ('R', pR),
+                                 ('orbit_angle', angle), ('orbit_speed', speed / radii),
+                                 ('orbit_radius', np.broadcast_to(radii, (S, P))),
+                                 ('clockwise', clockwise)):
+                view[name][:, planet_slot] = values
+            view['color'][:, planet_slot] = len(star_colors) + rng.integers(0, len(planet_colors), (S, P))
+
+        if P and K:
+            # Спутники дальше расстояния столкновения с планетой ((R_p + 0.3 R_p) * 1e9),
+            # каждый следующий спутник планеты — на своей полосе шириной 0.7 R_p * 1e9,
+            # чтобы спутники одной планеты не сталкивались друг с другом
+            parent_m = np.repeat(pm, K, axis=1)
+            parent_R = np.repeat(pR, K, axis=1)
+            band = np.tile(np.arange(K), P)
+            r = parent_R * 1e9 * (1.4 + 0.7 * band + rng.uniform(0, 0.1, (S, P * K)))
+            angle = rng.uniform(0, 2 * np.pi, (S, P * K))
+            speed = np.sqrt(gravitational_constant * parent_m / r)
+            for name, values in (('x', np.repeat(px, K, axis=1) + r * np.cos(angle)),
+                                 ('y', np.repeat(py, K, axis=1) + r * np.sin(angle)),
+                                 ('Vx', np.repeat(pvx, K, axis=1) + speed * np.sin(angle)),
+                                 ('Vy', np.repeat(pvy, K, axis=1) - speed * np.cos(angle)),
+                                 ('m', parent_m * 0.001), ('R', parent_R * 0.3),
+                                 ('orbit_angle', angle), ('orbit_speed', speed / r), ('orbit_radius', r)):
+                view[name][:, satellite_slot] = values
+            view['color'][:, satellite_slot] = len(palette) - 1
+
+        yield first_star * per_star, columns
+
+
+def generate_state(seed=0, star_count=3, planets_per_star=20, satellites_per_planet=0, **options):
+    """Собирает систему потокового генератора прямо в хранилище SystemState,
+    минуя объекты. Параметры — как у generate_blocks.
+    """
+    state = SystemState(body_count(star_count, planets_per_star, satellites_per_planet))
+    colors = np.array(palette, dtype=object)
+    for start, columns in generate_blocks(seed, star_count, planets_per_star, satellites_per_planet, **options):
+        end = start + len(columns['x'])
+        for name in checkpoint.state_columns:
+            getattr(state, name)[start:end] = columns[name]
+        state.color[start:end] = colors[columns['color']]
+    return state
+
+
+def write_text(filename, blocks):
+    """Пишет блоки generate_blocks в текстовый формат solar_io построчно по блокам."""
+    colors = np.array(palette, dtype=object)
+    with open(filename, 'w') as out_file:
+        for start, columns in blocks:
+            solar_io.write_text_block(out_file, solar_io.text_columns(dict(columns, color=colors[columns['color']])))
+
+
+def write_checkpoint(filename, n, blocks):
+    """Пишет блоки generate_blocks системы из **n** тел в контрольную точку,
+    заполняя отображённые в память столбцы по частям.
+    """
+    with checkpoint.create_checkpoint(filename, n, palette) as columns:
+        for start, block in blocks:
+            end = start + len(block['x'])
+            for name, column in columns.items():
+                column[start:end] = block[name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming procedural system generator")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stars", type=int, default=3)
+    parser.add_argument("--planets", type=int, default=20, help="планет у каждой звезды")
+    parser.add_argument("--satellites", type=int, default=0, help="спутников у каждой планеты")
+    parser.add_argument("--star-spacing", type=float)
+    parser.add_argument("--block-stars", type=int, default=256)
+    parser.add_argument("--output", required=True, help="файл .txt или контрольная точка .ckpt")
+    args = parser.parse_args()
+
+    n = body_count(args.stars, args.planets, args.satellites)
+    blocks = generate_blocks(args.seed, args.stars, args.planets, args.satellites,
+                             args.star_spacing, args.block_stars)
+    start = time.perf_counter()
+    if args.output.endswith(checkpoint.extension):
+        write_checkpoint(args.output, n, blocks)
+    else:
+        write_text(args.output, blocks)
+    print(f"{n} bodies written to {args.output} in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
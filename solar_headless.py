@@ -0,0 +1,161 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Моделирование системы без окна: для расчётных машин без графики.
+Модуль не импортирует tkinter; модель считается так быстро, как позволяет
+процессор, без паузы между шагами.
+
+Запуск: python solar_headless.py solar_system.txt --dt 100000 --steps 10000 --output result.txt
+Продолжение с контрольной точки: python solar_headless.py run.ckpt --steps 10000 --checkpoint run.ckpt
+"""
+
+import argparse
+import time
+
+import checkpoint
+from diagnostics import DiagnosticsBudget, system_diagnostics
+from solar_io import load_space_objects, write_space_objects
+from solar_model import SolarSystemModel
+from trajectory import TrajectoryRecorder, frames_extension
+
+
+def make_model(space_objects, integrator='euler', force_solver='direct', theta=0.5,
+               multirate=False, orbit_propagator='circular'):
+    """Создаёт модель в массивах с заданными настройками."""
+    model = SolarSystemModel()
+    model.use_arrays = True
+    model.integrator = integrator
+    model.force_solver = force_solver
+    model.theta = theta
+    model.multirate = multirate
+    model.orbit_propagator = orbit_propagator
+    model.space_objects = space_objects
+    return model
+
+
+def load_model(system_file, **settings):
+    """Модель из текстового файла системы или из контрольной точки.
+    Настройки **settings** контрольной точки заменяют сохранённые в ней.
+    """
+    if system_file.endswith(checkpoint.extension):
+        model = checkpoint.load_checkpoint(system_file)
+        for name, value in settings.items():
+            setattr(model, name, value)
+        return model
+    return make_model(load_space_objects(system_file), **settings)
+
+
+def save_model(filename, model, compact=False):
+    """Записывает модель в контрольную точку или в текстовый файл по расширению;
+    **compact** — текст с округлёнными числами (см. solar_io.write_space_objects).
+    """
+    if filename.endswith(checkpoint.extension):
+        checkpoint.save_checkpoint(filename, model)
+    else:
+        write_space_objects(filename, model.ensure_state(), compact)
+
+
+def run_model(model, dt, steps, checkpoint_file=None, checkpoint_every=0, recorder=None, diagnostics=None):
+    """Делает **steps** шагов модели по **dt** секунд, каждые **checkpoint_every** шагов
+    записывая контрольную точку в **checkpoint_file**. Если передан **recorder**
+    (TrajectoryRecorder), после каждого шага ему отдаётся состояние системы.
+    Если передан **diagnostics** (DiagnosticsBudget), интегралы движения считаются
+    до первого и после последнего шага, а между ними — в пределах доли времени
+    бюджета; вместе с моментом расчёта они попадают в список stats["diagnostics"].
+    Возвращает словарь со статистикой: число шагов, затраченное время и шагов в секунду.
+    """
+    history = []
+
+    def measure():
+        point = diagnostics.run(system_diagnostics, model.ensure_state(), theta=model.theta)
+        point["time"] = model.physical_time
+        history.append(point)
+
+    start = time.perf_counter()
+    if diagnostics is not None:
+        measure()
+    for step in range(1, steps + 1):
+        model.recalculate_positions(dt)
+        if recorder is not None:
+            recorder.record_state(model.physical_time, model.ensure_state())
+        if diagnostics is not None and (diagnostics.due() or step == steps):
+            measure()
+        if checkpoint_file and checkpoint_every and step % checkpoint_every == 0:
+            checkpoint.save_checkpoint(checkpoint_file, model)
+    elapsed = time.perf_counter() - start
+    return {
+        "steps": steps,
+        "seconds": elapsed,
+        "steps_per_second": steps / elapsed if elapsed > 0 else float('inf'),
+        "physical_time": model.physical_time,
+        "diagnostics": history,
+    }
+
+
+def run(system_file, dt, steps, output=None, checkpoint_file=None, checkpoint_every=0,
+        record=None, record_every=1, diagnostics=None, compact=False, **settings):
+    """Загружает систему из **system_file** (текст или контрольная точка), моделирует
+    **steps** шагов по **dt** секунд и, если задан **output**, записывает итоговое
+    состояние в этот файл (в контрольную точку, если у него расширение .ckpt).
+    Если задан **record**, траектории каждого record_every-го шага пишутся в этот файл
+    (без сжатия, для воспроизведения, если у него расширение .frames).
+    **diagnostics** — доля времени на расчёт интегралов движения (None — не считать).
+    **compact** — записать текстовый **output** с округлёнными числами.
+    Остальные именованные параметры — настройки модели, как в make_model.
+    Возвращает модель и словарь статистики run_model.
+    """
+    model = load_model(system_file, **settings)
+    recorder = None
+    if record:
+        recorder = TrajectoryRecorder(record, model.ensure_state().n, decimation=record_every,
+                                      compress=not record.endswith(frames_extension))
+        recorder.record_state(model.physical_time, model.state)
+    budget = DiagnosticsBudget(diagnostics) if diagnostics else None
+    try:
+        stats = run_model(model, dt, steps, checkpoint_file, checkpoint_every, recorder, budget)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    if output:
+        save_model(output, model, compact)
+    return model, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless solar system simulation")
+    parser.add_argument("system_file")
+    parser.add_argument("--dt", type=float, default=1000000)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--output")
+    parser.add_argument("--compact", action="store_true",
+                        help="текстовый --output с округлёнными числами, файл короче")
+    parser.add_argument("--checkpoint", help="файл контрольной точки, обновляемый по ходу счёта")
+    parser.add_argument("--checkpoint-every", type=int, default=0)
+    parser.add_argument("--record", help="файл для записи траекторий (.trj или .frames)")
+    parser.add_argument("--record-every", type=int, default=1)
+    parser.add_argument("--diagnostics", type=float, metavar="FRACTION",
+                        help="доля времени на контроль энергии и импульса, например 0.05")
+    parser.add_argument("--integrator")
+    parser.add_argument("--force-solver")
+    parser.add_argument("--theta", type=float)
+    parser.add_argument("--multirate", action="store_true", default=None)
+    parser.add_argument("--orbit-propagator")
+    args = parser.parse_args()
+
+    settings = {name: getattr(args, name) for name in
+                ('integrator', 'force_solver', 'theta', 'multirate', 'orbit_propagator')
+                if getattr(args, name) is not None}
+    model, stats = run(args.system_file, args.dt, args.steps, args.output,
+                       args.checkpoint, args.checkpoint_every, args.record, args.record_every, args.diagnostics,
+                       args.compact, **settings)
+    print(f"{model.ensure_state().n} bodies, {stats['steps']} steps in {stats['seconds']:.3f} s "
+          f"({stats['steps_per_second']:.1f} steps/sec), {stats['physical_time']:.1f} seconds simulated")
+    history = stats["diagnostics"]
+    if len(history) > 1:
+        first, last = history[0], history[-1]
+        print(f"{len(history)} diagnostics: energy drift {abs((last['te'] - first['te']) / first['te']):.3e}, "
+              f"angular momentum drift {abs((last['L'] - first['L']) / first['L']):.3e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Чтение и запись файлов с описанием системы небесных тел.
+Модуль не зависит от tkinter и используется как окном, так и
+безоконным запуском моделирования.
+"""
+
+import itertools
+import os
+
+import numpy as np
+
+import checkpoint
+from barnes_hut import QuadTree
+from solar_state import SystemState, type_codes
+from space_objects import Star, Planet, Satellite, unbound_object
+
+object_types = {'Star': Star, 'Planet': Planet, 'Satellite': Satellite}
+"""Классы объектов по первому слову строки файла"""
+
+
+def load_space_objects(filename):
+    """Загружает солнечную систему из файла и возвращает список объектов.
+    Строки имеют формат:
+    <тип> <радиус> <цвет> <масса> <x> <y> <Vx> <Vy>
+    Родители назначаются после чтения всего файла (см. assign_parents),
+    так что результат не зависит от порядка строк.
+
+    Параметры:
+
+    **filename** — имя входного файла.
+    """
+    rows = []
+    with open(filename, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] in object_types:
+                rows.append(parts)
+
+    space_objects = _make_objects(rows)
+    assign_parents(space_objects)
+    return space_objects
+
+
+def stream_space_objects(filename, first_chunk=1000, growth=2, max_chunk=250000):
+    """Читает систему из файла кусками и выдаёт их по мере чтения:
+    пары (объекты куска, доля прочитанного файла). Файл целиком в памяти
+    не держится.
+
+    Первые тела появляются почти сразу, а каждый следующий кусок в **growth** раз
+    больше предыдущего (но не больше **max_chunk** строк), так что кусков
+    немного. Модель дописывает каждый кусок в конец хранилища
+    (SolarSystemModel.append_objects): работа с объектами пропорциональна размеру
+    куска, а от числа уже загруженных тел зависит только копирование столбцов.
+
+    Родители ищутся среди уже прочитанных звёзд и планет, включая текущий кусок,
+    так что родитель должен быть описан не позже куска со своими детьми. Для
+    файлов, где родители идут раньше детей, результат тот же, что у load_space_objects.
+
+    Параметры:
+
+    **filename** — имя входного файла.
+    **first_chunk** — число строк в первом куске.
+    """
+    size = os.path.getsize(filename) or 1
+    pools = {parent_type: ([], np.zeros(0), np.zeros(0)) for _, parent_type, _ in parent_types}
+    chunk = first_chunk
+    consumed = 0
+    with open(filename, 'rb') as f:
+        while True:
+            lines = list(itertools.islice(f, chunk))
+            if not lines:
+                return
+            consumed += sum(map(len, lines))
+            chunk = min(max_chunk, chunk * growth)
+
+            text = b"".join(lines).decode()
+            objects = _make_objects([parts for parts in map(str.split, text.splitlines())
+                                     if parts and parts[0] in object_types])
+            types = np.array([obj.type for obj in objects])
+            x, y, Vx, Vy = _columns(objects)
+            for parent_type, (pool, pool_x, pool_y) in pools.items():
+                added = np.flatnonzero(types == parent_type)
+                pool.extend(objects[i] for i in added.tolist())
+                pools[parent_type] = pool, np.concatenate((pool_x, x[added])), np.concatenate((pool_y, y[added]))
+            for child_type, parent_type, attribute in parent_types:
+                children = np.flatnonzero(types == child_type)
+                pool, pool_x, pool_y = pools[parent_type]
+                if len(children) and pool:
+                    _attach([objects[i] for i in children.tolist()], x[children], y[children],
+                            Vx[children], Vy[children], attribute, pool, pool_x, pool_y)
+            yield objects, consumed / size
+
+
+def _make_objects(rows):
+    """Объекты без родителей по строкам файла, разбитым на слова."""
+    R, m, x, y, Vx, Vy = (list(map(float, [parts[k] for parts in rows])) for k in (1, 3, 4, 5, 6, 7))
+    return [unbound_object(object_types[parts[0]], {
+        "R": R[k], "color": parts[2], "m": m[k], "x": x[k], "y": y[k], "Vx": Vx[k], "Vy": Vy[k]})
+        for k, parts in enumerate(rows)]
+
+
+def _columns(objects):
+    """Массивы x, y, Vx, Vy списка объектов."""
+    return tuple(np.fromiter((getattr(obj, name) for obj in objects), dtype=float, count=len(objects))
+                 for name in ('x', 'y', 'Vx', 'Vy'))
+
+
+parent_types = (('planet', 'star', 'parent_star'), ('satellite', 'planet', 'parent_planet'))
+"""Тип объекта, тип его родителя и атрибут со ссылкой на родителя"""
+
+
+def assign_parents(space_objects):
+    """Назначает родителем каждой планеты ближайшую звезду, каждого спутника —
+    ближайшую планету (из равноудалённых — описанную раньше) и вычисляет
+    параметры круговой орбиты вокруг родителя.
+    Ближайшие родители ищутся сразу для всех тел по квадродереву над родителями,
+    за O(log M) на тело вместо перебора всех M родителей.
+
+    Параметры:
+
+    **space_objects** — список объектов.
+    """
+    types = np.array([obj.type for obj in space_objects])
+    x, y, Vx, Vy = _columns(space_objects)
+    for child_type, parent_type, attribute in parent_types:
+        children = np.flatnonzero(types == child_type)
+        parents = np.flatnonzero(types == parent_type)
+        if not len(children) or not len(parents):
+            continue
+        _attach([space_objects[i] for i in children.tolist()], x[children], y[children], Vx[children],
+                Vy[children], attribute, [space_objects[i] for i in parents.tolist()], x[parents], y[parents])
+
+
+def _attach(children, x, y, Vx, Vy, attribute, parents, parent_x, parent_y):
+    """Записывает в атрибут **attribute** объектов **children** с координатами x, y
+    и скоростями Vx, Vy ближайший из объектов **parents** с координатами
+    parent_x, parent_y и вычисляет параметры круговой орбиты вокруг него.
+    """
+    nearest = QuadTree(parent_x, parent_y, np.ones(len(parents))).nearest(x, y)
+    dx = x - parent_x[nearest]
+    dy = y - parent_y[nearest]
+    orbit_radius = np.hypot(dx, dy)
+    orbit_angle = np.arctan2(dy, dx)
+    velocity_tangent = (-Vx * dy + Vy * dx) / orbit_radius
+    orbit_speed = velocity_tangent / orbit_radius
+    for obj, parent, radius, angle, speed, clockwise in zip(
+            children, nearest.tolist(), orbit_radius.tolist(), orbit_angle.tolist(),
+            orbit_speed.tolist(), (velocity_tangent > 0).tolist()):
+        setattr(obj, attribute, parents[parent])
+        obj.orbit_radius = radius
+        obj.orbit_angle = angle
+        obj.orbit_speed = speed
+        obj.clockwise = clockwise
+
+
+compact_digits = 9
+"""Значащих цифр в числах компактного текстового файла"""
+
+type_names = {'star': 'Star', 'planet': 'Planet', 'satellite': 'Satellite'}
+"""Первое слово строки файла по типу объекта"""
+
+code_names = {code: type_names[name] for name, code in type_codes.items()}
+"""Первое слово строки файла по коду типа хранилища"""
+
+
+def format_numbers(values, compact=False):
+    """Запись чисел столбца **values**: точная (как str) или, при **compact**,
+    с compact_digits значащими цифрами.
+    """
+    if isinstance(values, np.ndarray):
+        values = values.tolist()
+    return list(map(('%.' + str(compact_digits) + 'g').__mod__ if compact else str, values))
+
+
+text_fields = ('type_code', 'R', 'color', 'm', 'x', 'y', 'Vx', 'Vy')
+"""Столбцы хранилища, из которых составляется строка файла, по порядку"""
+
+
+def text_columns(columns, compact=False):
+    """Столбцы строк файла (тип, R, цвет, m, x, y, Vx, Vy) по словарю массивов
+    **columns** с ключами text_fields, как в хранилище состояния. Тела
+    с неизвестным кодом типа пропускаются.
+    """
+    known = columns['type_code'] >= 0
+    names = [code_names[code] for code in columns['type_code'][known].tolist()]
+    colors = list(map(str, columns['color'][known].tolist()))
+    R, m, x, y, Vx, Vy = (format_numbers(columns[name][known], compact)
+                          for name in ('R', 'm', 'x', 'y', 'Vx', 'Vy'))
+    return names, R, colors, m, x, y, Vx, Vy
+
+
+def write_text_block(out_file, columns):
+    """Пишет в **out_file** одним вызовом write строки по столбцам **columns**
+    (см. text_columns).
+    """
+    if columns[0]:
+        out_file.write("\n".join(map(" ".join, zip(*columns))) + "\n")
+
+
+def _text_columns(space_objects, start, end, compact):
+    """Столбцы строк файла для тел с номерами [start, end): тип, R, цвет, m, x, y, Vx, Vy."""
+    if isinstance(space_objects, SystemState):
+        return text_columns({name: getattr(space_objects, name)[start:end] for name in text_fields}, compact)
+    else:
+        objects = [obj for obj in space_objects[start:end] if obj.type in type_names]
+        names = [type_names[obj.type] for obj in objects]
+        colors = [str(obj.color) for obj in objects]
+        numbers = [[getattr(obj, name) for obj in objects] for name in ('R', 'm', 'x', 'y', 'Vx', 'Vy')]
+    R, m, x, y, Vx, Vy = (format_numbers(column, compact) for column in numbers)
+    return names, R, colors, m, x, y, Vx, Vy
+
+
+def write_space_objects(filename, space_objects, compact=False, binary=False, block_size=65536):
+    """Сохраняет систему в файл в формате, который читает load_space_objects.
+    Тела пишутся блоками по **block_size**: столбцы блока переводятся в текст
+    целиком, и блок уходит в файл одним вызовом write.
+
+    Параметры:
+
+    **filename** — имя выходного файла.
+    **space_objects** — список объектов или хранилище состояния SystemState.
+    **compact** — писать числа с compact_digits значащими цифрами: файл заметно
+    короче и читается теми же загрузчиками, но координаты и скорости округляются.
+    **binary** — записать вместо текста контрольную точку (модуль checkpoint).
+    """
+    if binary:
+        state = space_objects
+        if not isinstance(state, SystemState):
+            state = SystemState.from_objects(space_objects, bind=False)
+        checkpoint.save_state(filename, state)
+        return
+
+    n = space_objects.n if isinstance(space_objects, SystemState) else len(space_objects)
+    with open(filename, 'w') as out_file:
+        for start in range(0, n, block_size):
+            write_text_block(out_file, _text_columns(space_objects, start, start + block_size, compact))
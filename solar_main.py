@@ -1,16 +1,25 @@
 import tkinter
 from tkinter.filedialog import *
+import numpy as np
 from parse_data import *
+from diagnostics import DiagnosticsBudget, calculate_system_energy
+from solar_model import SolarSystemModel
+from trails import TrailBuffer
+from trajectory import TrajectoryRecorder, extension as trajectory_extension
 
 class Window:
-    def __init__(self, window_width=800, window_height=800):
+    def __init__(self, window_width=800, window_height=800, trail_length=500):
         self.space_objects = []
+        self.model = SolarSystemModel()
+        self.model.use_arrays = True
+        self.body_images = []
         self.physical_time = 0
         self.perform_execution = False
         self.displayed_time = None
         self.time_step = None
         self.statistics_history = []
         self.frame_counter = 0
+        self.diagnostics_budget = DiagnosticsBudget(0.05)
         self.space = None
         self.window_width = window_width
         self.window_height = window_height
@@ -22,6 +31,12 @@ class Window:
         self.start_button = None
         self.parser = Parser()
         self.show_orbits = True
+        self.trail_length = trail_length
+        self.trails = TrailBuffer(0, trail_length)
+        self.trail_bodies = []
+        self.trail_lines = []
+        self.recorder = None
+        self.record_button = None
 
     def scale_x(self, x):
         return int((x - self.camera_x) * self.scale_factor) + self.window_width // 2
@@ -29,6 +44,11 @@ class Window:
     def scale_y(self, y):
         return self.window_height // 2 - int((y - self.camera_y) * self.scale_factor)
 
+    def scale_points(self, x, y):
+        """То же, что scale_x и scale_y, сразу для массивов координат."""
+        return (((x - self.camera_x) * self.scale_factor).astype(np.int64) + self.window_width // 2,
+                self.window_height // 2 - ((y - self.camera_y) * self.scale_factor).astype(np.int64))
+
     def zoom_in(self):  # Добавили event=None, чтобы можно было вызывать с кнопки
         """Приближает вид."""
         self.scale_factor *= 1.5
@@ -63,15 +83,15 @@ class Window:
         # Инвертируем флаг
         self.show_orbits = not self.show_orbits
 
-        # Проходим по всем объектам и либо показываем, либо прячем их линии орбит
-        for body in self.space_objects:
-            if body.orbit_line is not None:
+        # Проходим по всем линиям следов и либо показываем, либо прячем их
+        for line in self.trail_lines:
+            if line is not None:
                 if self.show_orbits:
                     # 'normal' делает объект видимым
-                    self.space.itemconfigure(body.orbit_line, state='normal')
+                    self.space.itemconfigure(line, state='normal')
                 else:
                     # 'hidden' делает объект невидимым
-                    self.space.itemconfigure(body.orbit_line, state='hidden')
+                    self.space.itemconfigure(line, state='hidden')
 
         print(f"Orbits visibility set to: {self.show_orbits}")
 
@@ -83,14 +103,13 @@ class Window:
         print('Scale factor:', self.scale_factor)
 
     def execution(self):
-        for obj in self.space_objects:
-            obj.calculate_force(self.space_objects)
-
-        for obj in self.space_objects:
-            obj.move_space_object(self.time_step.get())
+        """Один шаг моделирования (SolarSystemModel) и перерисовка тел и следов."""
+        self.model.recalculate_positions(self.time_step.get())
+        self.physical_time = self.model.physical_time
+        state = self.model.ensure_state()
 
-        if self.frame_counter % 10 == 0:  # Сбор статистики каждый 10 кадр для оптимизации
-            ke, pe, te = calculate_system_energy(self.space_objects)
+        if self.diagnostics_budget.due():  # На сбор статистики уходит не больше 5 % времени
+            ke, pe, te = self.diagnostics_budget.run(calculate_system_energy, self.space_objects)
             stats_point = {
                 "time": self.physical_time,
                 "ke": ke,
@@ -100,39 +119,74 @@ class Window:
             self.statistics_history.append(stats_point)
         self.frame_counter += 1
 
-        for body in self.space_objects:
-            screen_x = self.scale_x(body.x)
-            screen_y = self.scale_y(body.y)
-            body.orbit_points.append((body.x, body.y))
-            if len(body.orbit_points) > 500:
-                body.orbit_points.pop(0)
-
-            if self.show_orbits and len(body.orbit_points) > 1:
-                screen_points = []
-                for p_x, p_y in body.orbit_points:
-                    screen_points.append(self.scale_x(p_x))
-                    screen_points.append(self.scale_y(p_y))
-
-                if body.orbit_line is None:
-                    if body.type in ['planet', 'satellite']:
-                        body.orbit_line = self.space.create_line(
-                            screen_points, fill=body.color, width=1)
-                        self.space.tag_lower(body.orbit_line)
-                else:
-                    self.space.coords(body.orbit_line, screen_points)
-
-            body.update_object_position(
-                self.space, self.window_width, self.window_height,
-                screen_x, screen_y,
-                self.scale_factor, self.default_scale_factor
-            )
+        self.trails.append(state.x, state.y)
+        if self.show_orbits and len(self.trails) > 1:
+            self.draw_trails()
+        self.draw_bodies()
 
-        self.physical_time += self.time_step.get()
+        if self.recorder is not None:
+            self.record_trajectories()
         self.displayed_time.set("%.1f" % self.physical_time + " seconds gone")
 
         if self.perform_execution:
             self.space.after(101 - int(self.time_speed.get()), self.execution)
 
+    def create_body_images(self):
+        """Заводит по овалу на каждое тело; на место их ставит draw_bodies."""
+        self.body_images = [self.space.create_oval(0, 0, 0, 0, fill=obj.color) for obj in self.space_objects]
+
+    def draw_bodies(self):
+        """Переставляет овалы тел на текущие положения из хранилища модели;
+        радиус тела растёт вместе с приближением вида.
+        """
+        state = self.model.ensure_state()
+        x, y = self.scale_points(state.x, state.y)
+        r = np.maximum(1, (state.R * self.scale_factor / self.default_scale_factor).astype(np.int64))
+        for image, body_x, body_y, body_r in zip(self.body_images, x.tolist(), y.tolist(), r.tolist()):
+            self.space.coords(image, body_x - body_r, body_y - body_r, body_x + body_r, body_y + body_r)
+
+    def draw_trails(self):
+        """Переставляет линии следов планет и спутников; линия заводится
+        при первом рисовании следа, дальше только меняются её координаты.
+        """
+        lines = self.trails.screen_lines(self.scale_points, self.trail_bodies)
+        for k, (i, points) in enumerate(zip(self.trail_bodies, lines)):
+            if self.trail_lines[k] is None:
+                self.trail_lines[k] = self.space.create_line(
+                    points.tolist(), fill=self.space_objects[i].color, width=1)
+                self.space.tag_lower(self.trail_lines[k])
+            else:
+                self.space.coords(self.trail_lines[k], points.tolist())
+
+    def record_trajectories(self):
+        """Отдаёт текущее состояние тел записи траекторий."""
+        state = self.model.ensure_state()
+        self.recorder.record(self.physical_time, state.x, state.y, state.Vx, state.Vy)
+
+    def toggle_recording(self):
+        """Обработчик кнопки Record: начинает запись траекторий в выбранный файл
+        или заканчивает уже идущую запись.
+        """
+        if self.recorder is not None:
+            self.stop_recording()
+            return
+        out_filename = asksaveasfilename(filetypes=(("Trajectory file", trajectory_extension),))
+        if not out_filename:
+            return
+        self.recorder = TrajectoryRecorder(out_filename, len(self.space_objects))
+        self.record_trajectories()
+        self.record_button['text'] = "Stop Rec"
+        print(f"Recording trajectories to {out_filename}")
+
+    def stop_recording(self):
+        """Заканчивает запись траекторий и закрывает файл."""
+        if self.recorder is None:
+            return
+        self.recorder.close()
+        print(f"Recorded {self.recorder.samples} samples to {self.recorder.filename}")
+        self.recorder = None
+        self.record_button['text'] = "Record..."
+
     def start_execution(self):
         """Обработчик события нажатия на кнопку Start.
         Запускает циклическое исполнение функции execution.
@@ -161,19 +215,27 @@ class Window:
         self.statistics_history.clear()
         self.frame_counter = 0
         self.perform_execution = False
-        for obj in self.space_objects:
-            self.space.delete(obj.image)  # удаление старых изображений планет
-            if obj.orbit_line is not None:
-                self.space.delete(obj.orbit_line)
+        self.stop_recording()
+        for image in self.body_images:
+            self.space.delete(image)  # удаление старых изображений планет
+        self.body_images = []
+        for line in self.trail_lines:
+            if line is not None:
+                self.space.delete(line)
+        self.trail_lines = []
         in_filename = askopenfilename(filetypes=(("Text file", ".txt"),))
         if not in_filename:
             return
         self.space_objects = self.parser.read_space_objects_data_from_file(in_filename)
+        self.model.space_objects = self.space_objects
         max_distance = max([max(abs(obj.x), abs(obj.y)) for obj in self.space_objects])
         self.calculate_scale_factor(max_distance)
+        self.trails = TrailBuffer(len(self.space_objects), self.trail_length)
+        self.trail_bodies = [i for i, obj in enumerate(self.space_objects) if obj.type in ['planet', 'satellite']]
+        self.trail_lines = [None] * len(self.trail_bodies)
 
-        for obj in self.space_objects:
-            obj.create_object_image(self.space, self.scale_x(obj.x), self.scale_y(obj.y))
+        self.create_body_images()
+        self.draw_bodies()
 
     def save_stats_dialog(self):
         """Открывает диалог сохранения файла и записывает статистику."""
@@ -246,6 +308,8 @@ def main():
     save_file_button.pack(side=tkinter.LEFT)
     toggle_orbits_button = tkinter.Button(frame, text="Toggle Orbits", command=window.toggle_orbits_visibility)
     toggle_orbits_button.pack(side=tkinter.LEFT)
+    window.record_button = tkinter.Button(frame, text="Record...", command=window.toggle_recording)
+    window.record_button.pack(side=tkinter.LEFT)
 
     window.displayed_time = tkinter.StringVar()
     window.displayed_time.set(str(window.physical_time) + " seconds gone")
@@ -253,6 +317,7 @@ def main():
     time_label.pack(side=tkinter.RIGHT)
 
     root.mainloop()
+    window.stop_recording()
     print('Modelling finished!')
 
 
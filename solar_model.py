@@ -1,17 +1,109 @@
 
+import functools
 import math
 import random
 
+import numpy as np
 
-gravitational_constant = 6.67408E-11
+from barnes_hut import barnes_hut_forces
+from gravity import direct_forces, gravitational_constant, system_forces
+from integrators import integrators
+from kepler import KeplerOrbits
+from multirate import hierarchical_leapfrog
+from solar_state import SATELLITE, SystemState
+from spatial_hash import SpatialHash
+from system_tree import SystemTree
 
 
 class SolarSystemModel:
     def __init__(self):
-        self.space_objects = []
+        self._space_objects = []
+        self.state = None
+        self.use_arrays = False
+        self.force_solver = 'direct'
+        self.theta = 0.5
+        self.integrator = 'euler'
+        self.multirate = False
+        self.timestep_accuracy = 0.1
+        self.max_rung = 10
+        self.orbit_propagator = 'circular'
+        self.kepler = None
+        self.kepler_sync = None
+        self.collision_grid = SpatialHash()
+        self.collision_count = 0
+        self._object_tree = None
         self.physical_time = 0
         self.scale_factor = None
 
+    @property
+    def space_objects(self):
+        if self._space_objects is None:
+            self._space_objects = self.state.views()
+        return self._space_objects
+
+    @space_objects.setter
+    def space_objects(self, objects):
+        self._space_objects = objects
+        self.state = None
+
+    def arrays_enabled(self):
+        """Работает ли модель с хранилищем в массивах. Кроме явного use_arrays,
+        это нужно интеграторам с учётом сил, кеплеровым орбитам и модели,
+        восстановленной из массивов без объектов.
+        """
+        return (self.use_arrays or self._space_objects is None or self.multirate
+                or self.integrator != 'euler' or self.orbit_propagator != 'circular')
+
+    def load_state(self, state):
+        """Переводит модель на готовое хранилище **state**; объекты-представления
+        тел создаются только при первом обращении к space_objects.
+        """
+        self._space_objects = None
+        self._object_tree = None
+        self.state = state
+        self.kepler = None
+
+    def append_objects(self, objects, elapsed=0.0):
+        """Добавляет к системе тела **objects** (например, очередной кусок
+        потоковой загрузки), дописывая их в конец хранилища (SystemState.extend):
+        стоимость зависит от размера куска, а не от числа уже загруженных тел.
+
+        Координаты новых тел относятся к моменту на **elapsed** раньше текущего,
+        поэтому их планеты и спутники поворачиваются по круговым орбитам
+        на elapsed и ставятся относительно текущего положения родителей;
+        свободные тела начинают движение с того места, где описаны.
+        """
+        state = self.ensure_state()
+        start = state.n
+        state.extend(objects)
+        if self._space_objects is not None:
+            self._space_objects.extend(objects)
+        self.kepler = None
+        for idx in state.levels()[1:]:
+            idx = idx[idx >= start]
+            if len(idx):
+                state.advance_orbits(idx, elapsed)
+        return state
+
+    def object_tree(self):
+        """Дерево родительских связей списка space_objects, пересобираемое
+        только при смене или изменении длины списка.
+        """
+        objects = self.space_objects
+        if (self._object_tree is None or self._object_tree[0] is not objects
+                or len(self._object_tree[1].parent) != len(objects)):
+            self._object_tree = objects, SystemTree.from_objects(objects)
+        return self._object_tree[1]
+
+    def ensure_state(self):
+        """Возвращает хранилище состояния в массивах, пересоздавая его,
+        если список объектов изменился с момента последней сборки.
+        """
+        objects = self._space_objects
+        if self.state is None or (objects is not None and self.state.n != len(objects)):
+            self.state = SystemState.from_objects(objects)
+        return self.state
+
     def calculate_force(self, body):
         body.Fx = body.Fy = 0
         for obj in self.space_objects:
@@ -36,6 +128,114 @@ class SolarSystemModel:
                 body.Fx += force * dx / r
                 body.Fy += force * dy / r
 
+    def force_function(self):
+        """Функция расчёта сил вида f(x, y, m, targets) для выбранного метода:
+        'direct' — прямое суммирование, 'barnes_hut' — квадродерево с углом раскрытия theta.
+        """
+        if self.force_solver == 'direct':
+            return direct_forces
+        elif self.force_solver == 'barnes_hut':
+            return functools.partial(barnes_hut_forces, theta=self.theta)
+        raise ValueError(f"Неизвестный метод расчёта сил: {self.force_solver}")
+
+    def calculate_forces(self):
+        """Считает силы для всех тел сразу выбранным методом."""
+        system_forces(self.ensure_state(), self.force_function())
+
+    def accelerations(self, targets):
+        """Ускорения тел **targets** под действием сил тяготения всех тел системы.
+        Спутник без родительской планеты ни с чем не взаимодействует.
+        """
+        state = self.state
+        Fx, Fy = self.force_function()(state.x, state.y, state.m, targets)
+        lonely = state.type_code[targets] == SATELLITE
+        Fx[lonely] = 0
+        Fy[lonely] = 0
+        state.Fx[targets] = Fx
+        state.Fy[targets] = Fy
+
+        m = state.m[targets]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(m > 0, Fx / m, 0.0), np.where(m > 0, Fy / m, 0.0)
+
+    def integrator_function(self):
+        """Интегратор свободных тел: блочная схема при включённом multirate,
+        иначе выбранный в integrator.
+        """
+        if self.multirate:
+            return functools.partial(hierarchical_leapfrog, eta=self.timestep_accuracy,
+                                     max_rung=self.max_rung)
+        if self.integrator not in integrators:
+            raise ValueError(f"Неизвестный интегратор: {self.integrator}")
+        return integrators[self.integrator]
+
+    def current_kepler(self):
+        """Кеплеровы орбиты, если они описывают текущее состояние: построены для
+        этого хранилища, и с последнего расчёта по ним тела не двигало ничто
+        другое (круговой шаг, столкновение, кадр записи). Иначе None.
+        """
+        if (self.kepler is None or self.kepler.state is not self.state
+                or self.kepler_sync != (self.physical_time, self.collision_count)):
+            return None
+        return self.kepler
+
+    def kepler_orbits(self):
+        """Кеплеровы орбиты планет и спутников. Элементы пересчитываются по текущему
+        состоянию и моменту physical_time, если прежние перестали его описывать
+        (см. current_kepler).
+        """
+        self.ensure_state()
+        if self.current_kepler() is None:
+            self.kepler = KeplerOrbits(self.state, self.physical_time)
+            self.kepler_sync = self.physical_time, self.collision_count
+        return self.kepler
+
+    def propagate_kepler(self, kepler, t):
+        """Переносит планеты и спутники на момент **t** по орбитам **kepler**
+        и запоминает, что орбиты описывают состояние в этот момент.
+        """
+        kepler.propagate(t)
+        self.kepler_sync = t, self.collision_count
+
+    def orbit_function(self, t):
+        """Функция переноса планет и спутников на момент **t** для выбранного
+        orbit_propagator: 'circular' (None — круговые орбиты хранилища) или 'kepler'.
+        """
+        if self.orbit_propagator == 'circular':
+            return None
+        elif self.orbit_propagator == 'kepler':
+            kepler = self.kepler_orbits()
+            return lambda: self.propagate_kepler(kepler, t)
+        raise ValueError(f"Неизвестный способ движения по орбитам: {self.orbit_propagator}")
+
+    def seek(self, t):
+        """Переносит всю систему на момент времени **t** за один проход:
+        свободные тела движутся равномерно, планеты и спутники — по орбитам
+        выбранного orbit_propagator (круговым или кеплеровым).
+        Доступно только при интеграторе 'euler', движение остальных
+        интеграторов нельзя продолжить аналитически.
+        """
+        if self.integrator != 'euler' or self.multirate:
+            raise ValueError("Переход к моменту времени возможен только с интегратором 'euler'")
+        if self.orbit_propagator not in ('circular', 'kepler'):
+            raise ValueError(f"Неизвестный способ движения по орбитам: {self.orbit_propagator}")
+        state = self.ensure_state()
+        dt = t - self.physical_time
+        if not dt:
+            return
+        kepler = self.kepler_orbits() if self.orbit_propagator == 'kepler' else None
+
+        levels = state.levels()
+        free = levels[0]
+        state.x[free] += state.Vx[free] * dt
+        state.y[free] += state.Vy[free] * dt
+        if kepler is not None:
+            self.propagate_kepler(kepler, t)
+        else:
+            for idx in levels[1:]:
+                state.advance_orbits(idx, dt)
+        self.physical_time = t
+
     def move_space_object(self, body, dt):
         if body.type not in ['planet', 'satellite']:
             return
@@ -76,7 +276,17 @@ class SolarSystemModel:
             body.y = planet.y + distance * math.sin(new_angle)
 
     def recalculate_positions(self, dt):
-        for obj in self.space_objects:
+        if self.arrays_enabled():
+            state = self.ensure_state()
+            state.recalculate_positions(dt, self.integrator_function(), self.accelerations,
+                                        self.orbit_function(self.physical_time + dt))
+            self.physical_time += dt
+            self.check_collisions()
+            return
+
+        objects = self.space_objects
+        for i in self.object_tree().order:
+            obj = objects[i]
             if obj.type == 'planet':
                 direction = -1 if obj.clockwise else 1
                 obj.orbit_angle += direction * obj.orbit_speed * dt
@@ -110,13 +320,40 @@ class SolarSystemModel:
             else:
                 obj.x += obj.Vx * dt
                 obj.y += obj.Vy * dt
+        self.physical_time += dt
         self.check_collisions()
 
     def check_collisions(self):
-        for i, obj1 in enumerate(self.space_objects):
-            for obj2 in self.space_objects[i + 1:]:
-                if self.objects_collide(obj1, obj2):
-                    self.resolve_collision(obj1, obj2)
+        if self.arrays_enabled():
+            state = self.ensure_state()
+            x, y, R = state.x, state.y, state.R
+            body = state.view
+        else:
+            objects = self.space_objects
+            x = np.array([obj.x for obj in objects], dtype=float)
+            y = np.array([obj.y for obj in objects], dtype=float)
+            R = np.array([obj.R for obj in objects], dtype=float)
+            body = objects.__getitem__
+
+        if not len(R) or R.max() <= 0:
+            return
+        self.collision_grid.update(x, y, R * 1e9)
+        i, j = self.collision_grid.candidate_pairs()
+
+        # Расстояния всех пар-кандидатов считаются сразу, как в objects_collide;
+        # объекты строятся только для столкнувшихся пар, в порядке (i, j)
+        dx = x[i] - x[j]
+        dy = y[i] - y[j]
+        hit = (dx ** 2 + dy ** 2) ** 0.5 < (R[i] + R[j]) * 1e9
+        i = i[hit]
+        j = j[hit]
+        order = np.lexsort((j, i))
+        for i, j in zip(i[order].tolist(), j[order].tolist()):
+            obj1 = body(i)
+            obj2 = body(j)
+            if self.objects_collide(obj1, obj2):
+                self.resolve_collision(obj1, obj2)
+                self.collision_count += 1
 
     def resolve_collision(self, obj1, obj2):
         dx = obj1.x - obj2.x
@@ -0,0 +1,194 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Хранилище состояния системы в виде набора массивов NumPy (structure of arrays).
+Каждому телу соответствует индекс, по которому лежат его координаты, скорости,
+масса, радиус, параметры орбиты, индекс родителя и код типа.
+Объекты из space_objects после привязки становятся тонкими представлениями
+над этими массивами, поэтому отображение продолжает работать с ними как раньше.
+"""
+
+import numpy as np
+
+from integrators import euler
+from space_objects import Star, Planet, Satellite, BoundObject, bound_classes
+from system_tree import SystemTree
+
+STAR = 0
+PLANET = 1
+SATELLITE = 2
+
+type_codes = {'star': STAR, 'planet': PLANET, 'satellite': SATELLITE}
+"""Коды типов объектов"""
+
+object_classes = {STAR: Star, PLANET: Planet, SATELLITE: Satellite}
+"""Классы объектов по коду типа"""
+
+float_columns = ('x', 'y', 'Vx', 'Vy', 'Fx', 'Fy', 'm', 'R',
+                 'orbit_angle', 'orbit_speed', 'orbit_radius')
+"""Вещественные столбцы хранилища"""
+
+bound_attributes = float_columns + ('clockwise', 'color', 'parent_star', 'parent_planet')
+"""Атрибуты объекта, которые после привязки хранятся в массивах"""
+
+
+class SystemState:
+    def __init__(self, n):
+        self.n = n
+        for name in float_columns:
+            setattr(self, name, np.zeros(n))
+        self.parent = np.full(n, -1, dtype=np.int64)
+        self.type_code = np.zeros(n, dtype=np.int8)
+        self.clockwise = np.ones(n, dtype=bool)
+        self.color = np.full(n, "red", dtype=object)
+        self.objects = [None] * n
+        self._tree = None
+        self.kept_acceleration = None
+
+    @classmethod
+    def from_objects(cls, objects, bind=True):
+        """Создаёт хранилище по списку объектов и привязывает к нему объекты.
+
+        Параметры:
+
+        **objects** — список звёзд, планет и спутников.
+        **bind** — привязывать ли объекты; без привязки хранилище — просто копия их полей.
+        """
+        state = cls(len(objects))
+        index = {id(obj): i for i, obj in enumerate(objects)}
+
+        for name in ('x', 'y', 'Vx', 'Vy', 'Fx', 'Fy', 'm', 'R'):
+            getattr(state, name)[:] = [getattr(obj, name) for obj in objects]
+        for name in ('orbit_angle', 'orbit_speed', 'orbit_radius'):
+            getattr(state, name)[:] = [getattr(obj, name, 0.0) for obj in objects]
+        state.clockwise[:] = [getattr(obj, 'clockwise', True) for obj in objects]
+        state.type_code[:] = [type_codes.get(obj.type, -1) for obj in objects]
+        state.color[:] = [obj.color for obj in objects]
+
+        for i, obj in enumerate(objects):
+            parent = getattr(obj, 'parent_star', None) or getattr(obj, 'parent_planet', None)
+            if parent is not None:
+                state.parent[i] = index.get(id(parent), -1)
+
+        if bind:
+            for i, obj in enumerate(objects):
+                state.bind(obj, i)
+        return state
+
+    def extend(self, objects):
+        """Дописывает в конец хранилища тела **objects** и привязывает их.
+        Родителем нового тела может быть как другое новое тело, так и уже
+        привязанное к этому хранилищу. Из объектов читаются только новые тела,
+        старые столбцы лишь копируются при удлинении.
+        """
+        start = self.n
+        part = SystemState.from_objects(objects, bind=False)
+        for i, obj in enumerate(objects):
+            if part.parent[i] >= 0:
+                part.parent[i] += start
+                continue
+            parent = getattr(obj, 'parent_star', None) or getattr(obj, 'parent_planet', None)
+            if parent is not None and getattr(parent, '_state', None) is self:
+                part.parent[i] = parent._index
+
+        for name in float_columns + ('parent', 'type_code', 'clockwise', 'color'):
+            setattr(self, name, np.concatenate((getattr(self, name), getattr(part, name))))
+        self.objects += [None] * part.n
+        self.n += part.n
+        self._tree = None
+        for i, obj in enumerate(objects):
+            self.bind(obj, start + i)
+
+    def bind(self, obj, i):
+        """Делает объект представлением **i**-й строки хранилища:
+        меняет его класс на привязанный (см. space_objects.BoundObject).
+        """
+        for name in bound_attributes:
+            obj.__dict__.pop(name, None)
+        if not isinstance(obj, BoundObject):
+            obj.__class__ = bound_classes[type(obj)]
+        obj._state = self
+        obj._index = i
+        self.objects[i] = obj
+
+    def view(self, i):
+        """Возвращает объект-представление **i**-го тела, создавая его при необходимости."""
+        obj = self.objects[i]
+        if obj is None:
+            code = int(self.type_code[i])
+            obj = object_classes[code]()
+            self.bind(obj, i)
+            if code == PLANET:
+                obj.satellites = [self.view(j) for j in self.tree().children(i)]
+        return obj
+
+    def views(self):
+        """Возвращает список представлений всех тел."""
+        return [self.view(i) for i in range(self.n)]
+
+    def parent_of(self, i):
+        parent = self.parent[i]
+        return self.view(parent) if parent >= 0 else None
+
+    def set_parent(self, i, parent):
+        if parent is None:
+            self.parent[i] = -1
+        elif parent._state is self:
+            self.parent[i] = parent._index
+        else:
+            raise ValueError("Родительский объект не принадлежит этому хранилищу")
+        self._tree = None
+
+    def tree(self):
+        """Дерево родительских связей; пересобирается только после их изменения."""
+        if self._tree is None:
+            self._tree = SystemTree(self.parent)
+        return self._tree
+
+    def levels(self):
+        """Индексы тел по уровням дерева: свободные тела, их дети и т. д."""
+        return self.tree().levels
+
+    def recalculate_positions(self, dt, integrator=euler, acceleration=None, propagate_orbits=None):
+        """Векторный аналог SolarSystemModel.recalculate_positions:
+        свободные тела, затем каждый следующий уровень дерева обновляются
+        одним проходом, так что дети видят уже обновлённых родителей.
+
+        Параметры:
+
+        **dt** — шаг по времени.
+        **integrator** — интегратор свободных тел из модуля integrators.
+        **acceleration** — функция ускорений свободных тел для интегратора.
+        **propagate_orbits** — функция, переносящая планеты и спутники на конец шага;
+        по умолчанию они движутся по круговым орбитам.
+        """
+        free = self.levels()[0]
+
+        integrator(self, free, dt, acceleration)
+        if propagate_orbits is not None:
+            propagate_orbits()
+            return
+
+        for idx in self.levels()[1:]:
+            self.advance_orbits(idx, dt)
+
+    def advance_orbits(self, idx, dt):
+        """Поворачивает тела **idx** одного уровня дерева по круговым орбитам
+        на время **dt** и ставит их относительно текущего положения родителей.
+        """
+        parent = self.parent[idx]
+        direction = np.where(self.clockwise[idx], -1.0, 1.0)
+        angle = self.orbit_angle[idx] + direction * self.orbit_speed[idx] * dt
+        self.orbit_angle[idx] = angle
+
+        r = self.orbit_radius[idx]
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+        self.x[idx] = self.x[parent] + r * cos
+        self.y[idx] = self.y[parent] + r * sin
+
+        # Скорость спутника отсчитывается от скорости планеты, скорость планеты — нет
+        carried = self.type_code[idx] == SATELLITE
+        linear_speed = direction * self.orbit_speed[idx] * r
+        self.Vx[idx] = -linear_speed * sin + np.where(carried, self.Vx[parent], 0.0)
+        self.Vy[idx] = linear_speed * cos + np.where(carried, self.Vy[parent], 0.0)
@@ -1,16 +1,49 @@
 
 import tkinter
 
+import numpy as np
+
+from solar_state import PLANET, STAR
+
 window_width = 800
 window_height = 800
 header_font = "Arial-16"
 
+canvas_height = 700
+"""Высота холста; ниже холста в окне — кнопки"""
+
+body_tag = "body"
+"""Тег овалов тел на холсте"""
+
+orbit_tag = "orbit"
+"""Тег окружностей орбит на холсте"""
+
+cluster_tag = "cluster"
+"""Тег значков скоплений на холсте"""
+
+cluster_block = 4
+"""Сторона квадрата экрана в пикселях, мелкие тела в котором сливаются в один значок"""
+
+cluster_min = 4
+"""Сколько мелких тел должно попасть в квадрат, чтобы слиться в значок"""
+
+cluster_color = "gray75"
+"""Цвет значков скоплений"""
+
+orbit_min_radius = 1
+"""Орбиты с радиусом на экране меньше этого числа пикселей не рисуются"""
+
+orbit_shift_tolerance = 1e-6
+"""Разброс сдвигов окружностей орбит в пикселях, при котором кадр считается переносом"""
+
 
 class SolarSystemView:
-    def __init__(self, root, model):
+    def __init__(self, root, model, space=None):
+        """Вид модели **model** в окне **root**. Если передан готовый холст **space**
+        и root равен None, вид рисует на нём без кнопок и обработчиков мыши
+        (так вид используется в замерах производительности).
+        """
         self.model = model
-        self.space = tkinter.Canvas(root, width=window_width, height=700, bg="black")
-        self.space.pack(side=tkinter.TOP)
         self.show_orbits = True
 
         self.offset_x = 0
@@ -19,6 +52,25 @@ class SolarSystemView:
         self.drag_start_x = 0
         self.drag_start_y = 0
 
+        # Элементы холста живут между кадрами: по овалу на тело и по окружности на орбиту
+        self.body_items = []
+        self.body_shown = np.zeros(0, dtype=bool)
+        self.items_state = None
+        self.orbit_items = []
+        self.orbits_shown = 0
+        self.orbit_cache = None
+        self.orbit_frame = None
+        # Положения тел для рисования вместо текущих (снимок потока моделирования)
+        self.positions = None
+        self.cluster_items = []
+        self.clusters_shown = 0
+
+        if root is None:
+            self.space = space
+            return
+        self.space = space or tkinter.Canvas(root, width=window_width, height=canvas_height, bg="black")
+        self.space.pack(side=tkinter.TOP)
+
         self.space.bind("<ButtonPress-1>", self.start_drag)
         self.space.bind("<B1-Motion>", self.drag)
         self.space.bind("<MouseWheel>", self.zoom)
@@ -71,23 +123,179 @@ class SolarSystemView:
         else:
             self.space.coords(body.image, x - r, y - r, x + r, y + r)
 
+    def body_positions(self, state):
+        """Координаты x, y тел для рисования: заданные в positions, если они
+        относятся к тому же числу тел, иначе текущие из хранилища **state**.
+        """
+        if self.positions is not None and len(self.positions[0]) == state.n:
+            return self.positions
+        return state.x, state.y
+
+    def screen_coordinates(self, state):
+        """Экранные координаты всех тел хранилища **state** (то же, что scale_x
+        и scale_y, сразу для всех тел) и их радиусы в пикселях без округления.
+        """
+        x, y = self.body_positions(state)
+        x = ((x * self.model.scale_factor + self.offset_x) * self.scale).astype(np.int64) + window_width // 2
+        y = ((-y * self.model.scale_factor + self.offset_y) * self.scale).astype(np.int64) + window_height // 2
+        return x, y, state.R * self.scale
+
+    def sync_body_items(self):
+        """Заводит по овалу на каждое тело, если набор тел изменился с прошлого
+        вызова: при переходе модели на другое хранилище овалы создаются заново,
+        а для тел, дописанных в конец прежнего хранилища, — только новые.
+        Возвращает хранилище состояния модели.
+        """
+        state = self.model.ensure_state()
+        if self.items_state is not state or len(self.body_items) > state.n:
+            self.space.delete(body_tag)
+            self.body_items = []
+            self.body_shown = np.zeros(0, dtype=bool)
+            self.items_state = state
+        count = len(self.body_items)
+        if count < state.n:
+            self.body_items += [self.space.create_oval(0, 0, 0, 0, fill=color, state='hidden', tag=body_tag)
+                                for color in state.color[count:].tolist()]
+            self.body_shown = np.concatenate((self.body_shown, np.zeros(state.n - count, dtype=bool)))
+        return state
+
+    def draw_bodies(self):
+        """Переставляет овалы тел на текущие положения вызовами coords;
+        новые элементы холста создаются, только если изменился набор тел.
+
+        Тела за краем холста прячутся и не переставляются. Тела меньше пикселя
+        рисуются точкой, а если в квадрат cluster_block × cluster_block попало
+        не меньше cluster_min мелких тел, вместо них рисуется один значок скопления.
+        Так работа холста зависит от того, что видно, а не от числа тел.
+        """
+        state = self.sync_body_items()
+        if not state.n:
+            self.draw_clusters(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+            return
+        x, y, size = self.screen_coordinates(state)
+        r = np.maximum(1, size.astype(np.int64))
+        shown = (x + r >= 0) & (x - r <= window_width) & (y + r >= 0) & (y - r <= canvas_height)
+
+        small = np.flatnonzero(shown & (size <= cluster_block / 2))
+        # Видимые тела дальше края холста не более чем на r, поэтому номера квадратов от -1
+        block_x = x[small] // cluster_block + 1
+        block_y = y[small] // cluster_block + 1
+        blocks, inverse, counts = np.unique(block_x * (canvas_height + 2) + block_y,
+                                            return_inverse=True, return_counts=True)
+        merged = counts >= cluster_min
+        shown[small[merged[inverse.ravel()]]] = False
+        self.draw_clusters(blocks[merged] // (canvas_height + 2) - 1, blocks[merged] % (canvas_height + 2) - 1)
+
+        items = self.body_items
+        configure = self.space.itemconfigure
+        for i in np.flatnonzero(shown != self.body_shown).tolist():
+            configure(items[i], state='normal' if shown[i] else 'hidden')
+        self.body_shown = shown
+
+        visible = np.flatnonzero(shown)
+        x = x[visible]
+        y = y[visible]
+        # Тела меньше пикселя — точки
+        point = size[visible] < 1
+        r = np.where(point, 0, r[visible])
+        coords = self.space.coords
+        for i, x0, y0, x1, y1 in zip(visible.tolist(), (x - r).tolist(), (y - r).tolist(),
+                                     (x + r + point).tolist(), (y + r + point).tolist()):
+            coords(items[i], x0, y0, x1, y1)
+
+    def draw_clusters(self, block_x, block_y):
+        """Значки скоплений в квадратах экрана с номерами **block_x**, **block_y**.
+        Значки не удаляются, а прячутся, и в следующих кадрах используются снова.
+        """
+        count = len(block_x)
+        self.cluster_items = self.show_pool(
+            self.cluster_items, self.clusters_shown, count,
+            lambda: self.space.create_rectangle(0, 0, 0, 0, fill=cluster_color, outline="", tag=cluster_tag))
+        coords = self.space.coords
+        for item, left, top in zip(self.cluster_items, (block_x * cluster_block).tolist(),
+                                   (block_y * cluster_block).tolist()):
+            coords(item, left, top, left + cluster_block, top + cluster_block)
+        self.clusters_shown = count
+
+    def show_pool(self, pool, shown, count, create):
+        """Доводит пул элементов холста **pool** до **count** элементов, создавая
+        недостающие функцией **create**, показывает первые count и прячет
+        остальные из **shown** показанных раньше. Возвращает пул.
+        """
+        if count > len(pool):
+            pool = pool + [create() for _ in range(count - len(pool))]
+        for item in pool[count:shown]:
+            self.space.itemconfigure(item, state='hidden')
+        for item in pool[shown:count]:
+            self.space.itemconfigure(item, state='normal')
+        return pool
+
+    def orbit_geometry(self):
+        """Орбиты системы: номера звёзд-центров и радиусы орбит в метрах,
+        по одной окружности на каждую пару (звезда, радиус орбиты её планеты).
+        Считается один раз и пересчитывается, только если изменилась система:
+        модель перешла на другое хранилище, изменилось число тел или родители.
+        """
+        state = self.model.ensure_state()
+        tree = state.tree()
+        if self.orbit_cache is None or self.orbit_cache[:3] != (state, state.n, tree):
+            planets = np.flatnonzero(state.type_code == PLANET)
+            planets = planets[state.parent[planets] >= 0]
+            planets = planets[state.type_code[state.parent[planets]] == STAR]
+            pairs = np.unique(np.stack([state.parent[planets].astype(float), state.orbit_radius[planets]],
+                                       axis=1), axis=0).reshape(-1, 2)
+            self.orbit_cache = state, state.n, tree, pairs[:, 0].astype(np.int64), pairs[:, 1]
+            self.orbit_frame = None
+        return state, self.orbit_cache[3], self.orbit_cache[4]
+
     def draw_orbits(self):
-        self.space.delete("orbit")
-        stars = [obj for obj in self.model.space_objects if obj.type == 'star']
-
-        for star in stars:
-            planets = [obj for obj in self.model.space_objects if
-                       hasattr(obj, 'parent_star') and obj.parent_star == star]
-            unique_orbits = set()
-
-            for planet in planets:
-                if hasattr(planet, 'orbit_radius') and planet.orbit_radius not in unique_orbits:
-                    unique_orbits.add(planet.orbit_radius)
-                    x = self.scale_x(star.x)
-                    y = self.scale_y(star.y)
-                    radius = planet.orbit_radius * self.model.scale_factor * self.scale
-                    self.space.create_oval(x - radius, y - radius, x + radius, y + radius,
-                                           outline="gray", dash=(2, 2), tag="orbit")
+        """Окружности орбит из orbit_geometry под текущие положения звёзд, сдвиг
+        и масштаб. Рисуются только орбиты, задевающие холст, из пула окружностей,
+        которые прячутся и используются снова. Если с прошлого кадра видимые
+        окружности только сдвинулись на одно и то же число пикселей (перетаскивание
+        вида при стоящих звёздах), они переносятся одним вызовом move.
+        Центры орбит не округляются до пикселя, как у тел, — на глаз это не видно.
+        """
+        state, stars, radii = self.orbit_geometry()
+        x, y = self.body_positions(state)
+        # Центры без округления до пикселя, иначе сдвиг вида смещал бы окружности неодинаково
+        x = (x[stars] * self.model.scale_factor + self.offset_x) * self.scale + window_width // 2
+        y = (-y[stars] * self.model.scale_factor + self.offset_y) * self.scale + window_height // 2
+        r = radii * self.model.scale_factor * self.scale
+        shown = np.flatnonzero((r >= orbit_min_radius) & (x + r >= 0) & (x - r <= window_width)
+                               & (y + r >= 0) & (y - r <= canvas_height))
+        x = x[shown]
+        y = y[shown]
+        r = r[shown]
+
+        previous = self.orbit_frame
+        self.orbit_frame = shown, x, y, r
+        if previous is not None and np.array_equal(previous[0], shown) and np.array_equal(previous[3], r):
+            dx = x - previous[1]
+            dy = y - previous[2]
+            if not len(shown) or (np.ptp(dx) <= orbit_shift_tolerance and np.ptp(dy) <= orbit_shift_tolerance):
+                if len(shown) and (dx[0] or dy[0]):
+                    self.space.move(orbit_tag, float(dx[0]), float(dy[0]))
+                return
+
+        count = len(shown)
+        created = len(self.orbit_items)
+        self.orbit_items = self.show_pool(
+            self.orbit_items, self.orbits_shown, count,
+            lambda: self.space.create_oval(0, 0, 0, 0, outline="gray", dash=(2, 2), tag=orbit_tag))
+        if len(self.orbit_items) > created:
+            self.space.tag_lower(orbit_tag)
+        self.orbits_shown = count
+        coords = self.space.coords
+        for item, x0, y0, x1, y1 in zip(self.orbit_items, (x - r).tolist(), (y - r).tolist(),
+                                        (x + r).tolist(), (y + r).tolist()):
+            coords(item, x0, y0, x1, y1)
+
+    def hide_orbits(self):
+        self.space.delete(orbit_tag)
+        self.orbit_items = []
+        self.orbits_shown = 0
+        self.orbit_frame = None
 
     def start_drag(self, event):
         self.drag_start_x = event.x
@@ -126,12 +334,7 @@ class SolarSystemView:
         self.redraw_all()
 
     def redraw_all(self):
-        self.space.delete("all")
-        for body in self.model.space_objects:
-            if body.type == 'star':
-                self.create_star_image(body)
-            else:
-                self.create_planet_image(body)
-
+        """Переставляет тела и орбиты под текущие положения, сдвиг и масштаб."""
+        self.draw_bodies()
         if self.show_orbits:
             self.draw_orbits()
\ No newline at end of file
@@ -1,4 +1,40 @@
+class StateField:
+    """Атрибут привязанного космического объекта: значение лежит в столбце
+    **column** хранилища состояния (см. solar_state.SystemState).
+    """
+
+    def __init__(self, column=None):
+        self.column = column
+
+    def __set_name__(self, owner, name):
+        if self.column is None:
+            self.column = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return getattr(obj._state, self.column)[obj._index]
+
+    def __set__(self, obj, value):
+        getattr(obj._state, self.column)[obj._index] = value
+
+
+class ParentField:
+    """Ссылка привязанного объекта на родительский объект, в хранилище — индекс родителя."""
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return obj._state.parent_of(obj._index)
+
+    def __set__(self, obj, value):
+        obj._state.set_parent(obj._index, value)
+
+
 class SpaceObject:
+    _state = None
+    _index = -1
+
     def __init__(self, obj_type, x=0, y=0, Vx=0, Vy=0, m=0, R=5, color="red"):
         self.type = obj_type
         self.x = x
@@ -37,3 +73,66 @@ class Satellite(SpaceObject):
         self.orbit_radius = 0
         self.orbit_angle = 0.0
         self.orbit_speed = 0.0
+
+
+class BoundObject:
+    """Представление строки хранилища состояния. Привязка (SystemState.bind)
+    меняет класс объекта на подкласс с этой примесью, так что за чтение полей
+    через хранилище платят только привязанные объекты, а у непривязанных
+    поля остаются простыми атрибутами.
+    """
+    x = StateField()
+    y = StateField()
+    Vx = StateField()
+    Vy = StateField()
+    Fx = StateField()
+    Fy = StateField()
+    m = StateField()
+    R = StateField()
+    color = StateField()
+
+
+class BoundStar(BoundObject, Star):
+    pass
+
+
+class BoundPlanet(BoundObject, Planet):
+    parent_star = ParentField()
+    orbit_radius = StateField()
+    orbit_speed = StateField()
+    clockwise = StateField()
+    orbit_angle = StateField()
+
+
+class BoundSatellite(BoundObject, Satellite):
+    parent_planet = ParentField()
+    clockwise = StateField()
+    orbit_radius = StateField()
+    orbit_angle = StateField()
+    orbit_speed = StateField()
+
+
+bound_classes = {Star: BoundStar, Planet: BoundPlanet, Satellite: BoundSatellite}
+"""Классы привязанных объектов по классу объекта"""
+
+
+_defaults = {}
+
+
+def unbound_object(cls, fields):
+    """Объект класса **cls**, не привязанный к хранилищу состояния: поля по умолчанию,
+    поверх которых записан словарь **fields**. Конструктор вызывается только для
+    первого объекта класса, остальные получают копию его полей в обход дескрипторов,
+    что для миллионов объектов в несколько раз быстрее. Списки у каждого объекта свои.
+    """
+    if cls not in _defaults:
+        defaults = vars(cls())
+        _defaults[cls] = defaults, [name for name, value in defaults.items() if isinstance(value, list)]
+    defaults, lists = _defaults[cls]
+    obj = cls.__new__(cls)
+    values = obj.__dict__
+    values.update(defaults)
+    for name in lists:
+        values[name] = []
+    values.update(fields)
+    return obj
@@ -0,0 +1,125 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Пространственный хеш для поиска пар тел-кандидатов на столкновение.
+Плоскость делится на квадратные ячейки; если сторона ячейки не меньше
+наибольшего расстояния столкновения, сталкиваться могут только тела
+из одной ячейки или из соседних ячеек.
+
+Сторона ячейки выбирается по типичным телам, а не по самому большому:
+тела, чей радиус столкновения больше quantile-й доли остальных, считаются
+крупными и ищут соседей отдельно, в крупной сетке по самому большому телу.
+Так одна звезда-гигант не делает огромными все ячейки. Раскладка по ячейкам
+и перебор пар делаются сортировкой и searchsorted по ключам ячеек, без циклов
+по телам.
+"""
+
+import numpy as np
+
+neighbour_offsets = ((1, 0), (1, 1), (0, 1), (-1, 1))
+"""Половина соседних ячеек: каждая пара соседей просматривается ровно один раз"""
+
+all_offsets = tuple((ox, oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1))
+"""Ячейка тела и все восемь соседних"""
+
+max_cells = 2 ** 30
+"""Наибольшее число ячеек вдоль стороны; при большем ячейки укрупняются,
+чтобы ключ ячейки помещался в int64"""
+
+
+def cell_keys(x, y, cell_size):
+    """Номера ячеек тел вдоль осей, сдвинутые так, что соседи любой ячейки
+    имеют неотрицательные номера, и число ячеек вдоль оси y с запасом на соседей.
+    """
+    cell_x = np.floor(x / cell_size).astype(np.int64)
+    cell_y = np.floor(y / cell_size).astype(np.int64)
+    cell_x -= cell_x.min() - 1
+    cell_y -= cell_y.min() - 1
+    return cell_x, cell_y, int(cell_y.max()) + 2
+
+
+def neighbour_pairs(x, y, cell_size, queries, members, offsets):
+    """Пары (тело из **queries**, тело из **members**) из ячеек тела-запроса,
+    сдвинутых на **offsets**. Возвращает два массива индексов.
+    """
+    span = max(np.ptp(x), np.ptp(y))
+    cell_size = max(cell_size, span / max_cells)
+    cell_x, cell_y, height = cell_keys(x, y, cell_size)
+    key = cell_x * height + cell_y
+
+    order = members[np.argsort(key[members], kind='stable')]
+    sorted_keys = key[order]
+    first = []
+    second = []
+    for ox, oy in offsets:
+        target = (cell_x[queries] + ox) * height + cell_y[queries] + oy
+        start = np.searchsorted(sorted_keys, target, 'left')
+        counts = np.searchsorted(sorted_keys, target, 'right') - start
+        total = int(counts.sum())
+        if not total:
+            continue
+        ends = np.cumsum(counts)
+        positions = np.arange(total) - np.repeat(ends - counts, counts) + np.repeat(start, counts)
+        first.append(np.repeat(queries, counts))
+        second.append(order[positions])
+    if not first:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(first), np.concatenate(second)
+
+
+class SpatialHash:
+    """Поиск пар тел-кандидатов на столкновение; крупными считаются тела
+    с радиусом столкновения больше **quantile**-й доли радиусов.
+    """
+
+    def __init__(self, quantile=0.99):
+        self.quantile = quantile
+        self.cell_size = None
+        self.x = None
+        self.y = None
+        self.reach = None
+
+    def update(self, x, y, reach):
+        """Запоминает тела для поиска пар.
+
+        Параметры:
+
+        **x**, **y** — координаты тел.
+        **reach** — радиусы столкновения: тела i и j сталкиваются на расстоянии
+        меньше reach[i] + reach[j].
+        """
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.reach = np.asarray(reach, dtype=float)
+        positive = self.reach[self.reach > 0]
+        self.cell_size = 2 * np.quantile(positive, self.quantile) if len(positive) else None
+
+    def candidate_pairs(self):
+        """Пары индексов (i, j), i < j, тел, которые могут сталкиваться:
+        из одной или соседних ячеек. Каждая пара встречается один раз,
+        порядок не определён. Возвращает два массива индексов.
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if self.cell_size is None or len(self.x) < 2:
+            return empty, empty
+        x, y, reach = self.x, self.y, self.reach
+        large = reach > self.cell_size / 2
+        small = np.flatnonzero(~large)
+
+        # Мелкие с мелкими: расстояние столкновения не больше стороны ячейки
+        first, second = neighbour_pairs(x, y, self.cell_size, small, small, ((0, 0),))
+        inside = first < second
+        parts = [(first[inside], second[inside])]
+        parts.append(neighbour_pairs(x, y, self.cell_size, small, small, neighbour_offsets))
+
+        # Крупные со всеми: в сетке со стороной по самому крупному телу
+        large = np.flatnonzero(large)
+        if len(large):
+            first, second = neighbour_pairs(x, y, 2 * reach.max(), large, np.arange(len(x)), all_offsets)
+            # Пары двух крупных тел найдены дважды, пары тела с собой — лишние
+            keep = (second != first) & ~((reach[second] > self.cell_size / 2) & (second < first))
+            parts.append((first[keep], second[keep]))
+
+        first = np.concatenate([part[0] for part in parts])
+        second = np.concatenate([part[1] for part in parts])
+        return np.minimum(first, second), np.maximum(first, second)
@@ -0,0 +1,58 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Явное дерево «звезда → планета → спутник» над индексами тел.
+Хранит родителя каждого тела, списки детей в сжатом виде и разбиение
+на уровни по глубине, так что обновление можно вести целыми уровнями:
+сначала корни (свободные тела), затем их дети, затем дети детей.
+"""
+
+import numpy as np
+
+
+class SystemTree:
+    def __init__(self, parent):
+        """Параметры:
+
+        **parent** — массив индексов родителей, -1 у корней.
+        """
+        self.parent = np.asarray(parent, dtype=np.int64)
+        n = len(self.parent)
+
+        depth = np.where(self.parent < 0, 0, -1)
+        pending = np.flatnonzero(depth < 0)
+        while len(pending):
+            parent_depth = depth[self.parent[pending]]
+            resolved = parent_depth >= 0
+            if not resolved.any():
+                raise ValueError("Родительские связи тел образуют цикл")
+            depth[pending[resolved]] = parent_depth[resolved] + 1
+            pending = pending[~resolved]
+        self.depth = depth
+
+        self.levels = [np.flatnonzero(depth == d) for d in range(depth.max() + 1 if n else 1)]
+        """Индексы тел по уровням дерева, начиная с корней"""
+
+        self.order = np.concatenate(self.levels)
+        """Все тела в порядке, при котором родитель всегда раньше детей"""
+
+        attached = np.flatnonzero(self.parent >= 0)
+        attached = attached[np.argsort(self.parent[attached], kind='stable')]
+        self.child_index = attached
+        self.child_start = np.searchsorted(self.parent[attached], np.arange(n + 1))
+
+    @classmethod
+    def from_objects(cls, objects):
+        """Дерево над списком объектов по их атрибутам parent_star и parent_planet."""
+        index = {id(obj): i for i, obj in enumerate(objects)}
+        parent = []
+        for obj in objects:
+            parent_obj = getattr(obj, 'parent_star', None) or getattr(obj, 'parent_planet', None)
+            parent.append(index.get(id(parent_obj), -1) if parent_obj is not None else -1)
+        return cls(parent)
+
+    def parent_of(self, i):
+        return self.parent[i]
+
+    def children(self, i):
+        return self.child_index[self.child_start[i]:self.child_start[i + 1]]
@@ -0,0 +1,9 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Модули проекта лежат в корне репозитория, рядом с каталогом тестов."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,33 @@
+# coding: utf-8
+# license: GPLv3
+
+import os
+
+import numpy as np
+
+from checkpoint import load_checkpoint, save_checkpoint, state_columns
+from solar_io import load_space_objects
+from solar_model import SolarSystemModel
+
+system_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "solar_system.txt")
+"""Система для проверок: звезда, планеты и спутник"""
+
+
+def test_save_over_memory_mapped_checkpoint(tmp_path):
+    filename = str(tmp_path / "system.ckpt")
+    model = SolarSystemModel()
+    model.space_objects = load_space_objects(system_file)
+    model.use_arrays = True
+    save_checkpoint(filename, model)
+
+    mapped = load_checkpoint(filename, memory_map=True)
+    mapped.recalculate_positions(1e5)
+    expected = {name: getattr(mapped.state, name).copy() for name in state_columns}
+
+    save_checkpoint(filename, mapped)
+
+    for name in state_columns:
+        assert np.array_equal(getattr(mapped.state, name), expected[name]), name
+    saved = load_checkpoint(filename)
+    for name in state_columns:
+        assert np.array_equal(getattr(saved.state, name), expected[name]), name
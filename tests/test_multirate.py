@@ -0,0 +1,48 @@
+# coding: utf-8
+# license: GPLv3
+
+import numpy as np
+
+from multirate import neighbour_distances, rungs
+from solar_model import SolarSystemModel
+from solar_state import SystemState
+
+
+def binary_with_distant_star():
+    """Тесная пара звёзд (как в double_star.txt) и звезда далеко от неё."""
+    state = SystemState(3)
+    state.x[:] = [1e10, -1e10, 1e13]
+    state.Vy[:] = [40e3, -40e3, 0]
+    state.m[:] = 1e30
+    return state
+
+
+def test_rungs_follow_neighbour_distance():
+    state = binary_with_distant_star()
+    model = SolarSystemModel()
+    model.load_state(state)
+    idx = np.arange(3)
+    ax, ay = model.accelerations(idx)
+
+    rung = rungs(neighbour_distances(state, idx), ax, ay, 1e6, 0.1, 10)
+
+    # Собственный шаг пары 0.1 * sqrt(2e10 / |a|) ~ 3.5e4 с, т. е. ступень 5 из 10
+    assert rung.tolist() == [5, 5, 0]
+
+
+def test_distant_star_is_kicked_less_often():
+    model = SolarSystemModel()
+    model.load_state(binary_with_distant_star())
+    model.multirate = True
+    evaluated = np.zeros(3, dtype=int)
+    accelerations = model.accelerations
+
+    def counted(targets):
+        np.add.at(evaluated, targets, 1)
+        return accelerations(targets)
+
+    model.accelerations = counted
+    model.recalculate_positions(1e6)
+
+    assert evaluated[0] == evaluated[1] == 33
+    assert evaluated[2] == 2
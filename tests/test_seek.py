@@ -0,0 +1,47 @@
+# coding: utf-8
+# license: GPLv3
+
+import os
+
+import numpy as np
+
+from solar_io import load_space_objects
+from solar_model import SolarSystemModel
+
+system_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "solar_system.txt")
+"""Система для проверок: звезда, планеты и спутник"""
+
+
+def make_model(orbit_propagator):
+    model = SolarSystemModel()
+    model.space_objects = load_space_objects(system_file)
+    model.use_arrays = True
+    model.orbit_propagator = orbit_propagator
+    return model
+
+
+def test_seek_follows_circular_orbits():
+    stepped = make_model('circular')
+    for _ in range(100):
+        stepped.recalculate_positions(1e5)
+    sought = make_model('circular')
+    sought.seek(1e7)
+
+    assert np.allclose(sought.state.x, stepped.state.x, rtol=0, atol=1e3)
+    assert np.allclose(sought.state.y, stepped.state.y, rtol=0, atol=1e3)
+
+
+def test_seek_rebuilds_kepler_elements_moved_by_other_steps():
+    model = make_model('kepler')
+    model.seek(1e6)
+    model.orbit_propagator = 'circular'
+    for _ in range(10):
+        model.recalculate_positions(1e5)
+    model.orbit_propagator = 'kepler'
+    x = model.state.x.copy()
+    y = model.state.y.copy()
+
+    model.seek(model.physical_time)
+
+    assert np.array_equal(model.state.x, x)
+    assert np.array_equal(model.state.y, y)
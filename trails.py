@@ -0,0 +1,81 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Следы тел: кольцевые буферы последних положений.
+Положения всех тел лежат в одном заранее выделенном массиве (тело, отсчёт,
+x/y); новый отсчёт записывается на место самого старого, так что добавление
+стоит O(n) при любой длине следа.
+
+Для рисования из каждого следа берётся не больше max_drawn отсчётов с
+постоянным шагом по номеру отсчёта (поэтому от кадра к кадру выбираются одни
+и те же точки и линия не дрожит), они переводятся в экранные координаты одной
+операцией NumPy сразу для всех следов, а идущие подряд точки, попавшие в один
+пиксель, выбрасываются. Время кадра зависит от max_drawn, а не от длины следа.
+"""
+
+import numpy as np
+
+
+class TrailBuffer:
+    """Следы **n** тел по **length** последних положений;
+    рисуется не больше **max_drawn** точек каждого следа.
+    """
+
+    def __init__(self, n, length=500, max_drawn=1000):
+        if length < 2:
+            raise ValueError("Длина следа должна быть не меньше 2")
+        if max_drawn < 2:
+            raise ValueError("Число рисуемых точек следа должно быть не меньше 2")
+        self.n = n
+        self.length = length
+        self.max_drawn = max_drawn
+        self.points = np.empty((n, length, 2))
+        self.count = 0
+
+    def __len__(self):
+        """Число хранимых отсчётов каждого следа."""
+        return min(self.count, self.length)
+
+    def append(self, x, y):
+        """Добавляет ко всем следам текущие положения тел: массивы или списки длины n."""
+        slot = self.count % self.length
+        self.points[:, slot, 0] = x
+        self.points[:, slot, 1] = y
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def drawn_slots(self):
+        """Номера ячеек отсчётов, которые рисуются, в порядке времени:
+        каждый stride-й отсчёт по сквозному номеру и всегда самый новый.
+        """
+        stored = len(self)
+        first = self.count - stored
+        stride = max(1, -(-stored // (self.max_drawn - 1)))
+        numbers = np.arange(-(-first // stride) * stride, self.count, stride)
+        if not len(numbers) or numbers[-1] != self.count - 1:
+            numbers = np.append(numbers, self.count - 1)
+        return numbers % self.length
+
+    def screen_lines(self, transform, bodies=None):
+        """Экранные ломаные следов тел с номерами **bodies** (по умолчанию всех).
+        **transform**(x, y) переводит массивы мировых координат в массивы
+        целых экранных. Возвращает по плоскому массиву x0, y0, x1, y1, ...
+        на каждое тело; в нём не меньше двух точек, как требует линия холста.
+        """
+        slots = self.drawn_slots()
+        if bodies is None:
+            points = self.points[:, slots]
+        else:
+            points = self.points[np.ix_(bodies, slots)]
+        screen = np.empty(points.shape, dtype=np.int64)
+        screen[..., 0], screen[..., 1] = transform(points[..., 0], points[..., 1])
+
+        keep = np.ones(screen.shape[:2], dtype=bool)
+        keep[:, 1:] = (screen[:, 1:] != screen[:, :-1]).any(axis=2)
+        lines = []
+        for line, kept in zip(screen, keep):
+            flat = line[kept].ravel()
+            lines.append(flat if len(flat) >= 4 else np.tile(flat, 2))
+        return lines
@@ -0,0 +1,269 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Запись полной истории моделирования: время, координаты и скорости всех тел.
+Отсчёты копятся в памяти кусками по chunk_size строк; заполненный кусок
+уходит в фоновый поток, который сжимает его и дописывает в конец файла,
+так что шаг моделирования не ждёт ни zlib, ни диска.
+
+Внутри куска каждая величина хранится по телам (вдоль времени), вещественные
+числа переводятся в целые по их битовому представлению и заменяются
+разностями соседних отсчётов (дельта-кодирование без потерь), после чего
+каждая группа из block_size тел сжимается отдельно. Поэтому при чтении
+одного тела распаковываются только его группы и только из кусков,
+попадающих в нужный промежуток времени.
+
+Без сжатия (compress=False, расширение .frames) файл — это просто кадры
+подряд: t, x[n], y[n], Vx[n], Vy[n] в float64. Такой файл отображается
+в память целиком и читается по кадрам (модуль replay).
+"""
+
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+magic = b"SOLARTRJ"
+"""Сигнатура файла траекторий"""
+
+version = 1
+"""Версия формата"""
+
+extension = ".trj"
+"""Расширение файлов траекторий"""
+
+quantities = ('x', 'y', 'Vx', 'Vy')
+"""Записываемые величины каждого тела"""
+
+file_header = struct.Struct("<8sIII")
+"""Заголовок файла: сигнатура, версия, число тел, размер группы тел"""
+
+chunk_header = struct.Struct("<Idd")
+"""Заголовок куска: число отсчётов, время первого и последнего"""
+
+frames_magic = b"SOLARFRM"
+"""Сигнатура файла кадров без сжатия"""
+
+frames_extension = ".frames"
+"""Расширение файлов кадров без сжатия"""
+
+frames_header = struct.Struct("<8sII")
+"""Заголовок файла кадров: сигнатура, версия, число тел; кадры начинаются с 16-го байта"""
+
+
+def delta_encode(values):
+    """Разности соседних отсчётов вдоль последней оси по битовому представлению float64."""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.int64)
+    deltas = bits.copy()
+    deltas[..., 1:] -= bits[..., :-1]
+    return deltas
+
+
+def delta_decode(deltas):
+    """Обратное к delta_encode; переполнение int64 при сложении взаимно сокращается."""
+    return np.cumsum(deltas, axis=-1).view(np.float64)
+
+
+class TrajectoryRecorder:
+    """Пишет траектории **n** тел в файл **filename**.
+    Каждый decimation-й вызов record сохраняет отсчёт.
+    При **compress**=False кадры пишутся без сжатия, для отображения в память.
+    """
+
+    def __init__(self, filename, n, chunk_size=256, block_size=64, decimation=1, level=6, compress=True):
+        if decimation < 1:
+            raise ValueError("Прореживание должно быть не меньше 1")
+        self.filename = filename
+        self.n = n
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.decimation = decimation
+        self.level = level
+        self.compress = compress
+        self.calls = 0
+        self.samples = 0
+        self._new_buffer()
+
+        self._file = open(filename, 'wb')
+        if compress:
+            self._file.write(file_header.pack(magic, version, n, block_size))
+        else:
+            self._file.write(frames_header.pack(frames_magic, version, n))
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop, name="trajectory-writer", daemon=True)
+        self._thread.start()
+
+    def _new_buffer(self):
+        self._times = np.empty(self.chunk_size)
+        self._values = np.empty((len(quantities), self.chunk_size, self.n))
+        self._count = 0
+
+    def record(self, time, x, y, Vx, Vy):
+        """Запоминает состояние в момент **time**; x, y, Vx, Vy — массивы длины n."""
+        if self._error is not None:
+            raise self._error
+        self.calls += 1
+        if (self.calls - 1) % self.decimation:
+            return
+        row = self._count
+        self._times[row] = time
+        values = self._values
+        values[0, row] = x
+        values[1, row] = y
+        values[2, row] = Vx
+        values[3, row] = Vy
+        self._count += 1
+        self.samples += 1
+        if self._count == self.chunk_size:
+            self.flush()
+
+    def record_state(self, time, state):
+        """Запоминает состояние хранилища SystemState."""
+        self.record(time, state.x, state.y, state.Vx, state.Vy)
+
+    def flush(self):
+        """Отдаёт накопленные отсчёты фоновому потоку на сжатие и запись."""
+        if self._count:
+            self._queue.put((self._times[:self._count], self._values[:, :self._count]))
+            self._new_buffer()
+
+    def close(self):
+        """Дописывает остаток, дожидается фонового потока и закрывает файл."""
+        if self._thread is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_loop(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self._write_chunk(*chunk)
+                except Exception as error:
+                    self._error = error
+
+    def _write_chunk(self, times, values):
+        if not self.compress:
+            frames = np.empty((len(times), 1 + len(quantities) * self.n))
+            frames[:, 0] = times
+            frames[:, 1:] = values.transpose(1, 0, 2).reshape(len(times), -1)
+            frames.tofile(self._file)
+            self._file.flush()
+            return
+        blocks = [zlib.compress(delta_encode(times).tobytes(), self.level)]
+        for quantity in values:
+            by_body = quantity.T
+            for start in range(0, self.n, self.block_size):
+                blocks.append(zlib.compress(delta_encode(by_body[start:start + self.block_size]).tobytes(),
+                                            self.level))
+        self._file.write(chunk_header.pack(len(times), times[0], times[-1]))
+        self._file.write(np.array([len(block) for block in blocks], dtype='<u4').tobytes())
+        for block in blocks:
+            self._file.write(block)
+        self._file.flush()
+
+
+class TrajectoryReader:
+    """Чтение файла траекторий. При открытии читаются только заголовки кусков."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as in_file:
+            file_magic, file_version, self.n, self.block_size = file_header.unpack(
+                in_file.read(file_header.size))
+            if file_magic != magic:
+                raise ValueError(f"{filename} не является файлом траекторий")
+            if file_version != version:
+                raise ValueError(f"Неподдерживаемая версия файла траекторий: {file_version}")
+            self.block_count = -(-self.n // self.block_size)
+            table_size = 4 * (1 + len(quantities) * self.block_count)
+
+            self.chunks = []
+            while True:
+                raw = in_file.read(chunk_header.size)
+                if len(raw) < chunk_header.size:
+                    break
+                count, t_first, t_last = chunk_header.unpack(raw)
+                lengths = np.frombuffer(in_file.read(table_size), dtype='<u4').astype(np.int64)
+                offsets = in_file.tell() + np.concatenate(([0], np.cumsum(lengths)[:-1]))
+                self.chunks.append((count, t_first, t_last, offsets, lengths))
+                in_file.seek(int(lengths.sum()), 1)
+
+    def __len__(self):
+        """Число сохранённых отсчётов."""
+        return sum(chunk[0] for chunk in self.chunks)
+
+    def _selected_chunks(self, start, end):
+        return [chunk for chunk in self.chunks
+                if (start is None or chunk[2] >= start) and (end is None or chunk[1] <= end)]
+
+    @staticmethod
+    def _read_block(in_file, offsets, lengths, block):
+        in_file.seek(int(offsets[block]))
+        return np.frombuffer(zlib.decompress(in_file.read(int(lengths[block]))), dtype=np.int64)
+
+    def times(self, start=None, end=None):
+        """Моменты всех отсчётов в промежутке [start, end]."""
+        parts = []
+        with open(self.filename, 'rb') as in_file:
+            for count, t_first, t_last, offsets, lengths in self._selected_chunks(start, end):
+                parts.append(delta_decode(self._read_block(in_file, offsets, lengths, 0)))
+        times = np.concatenate(parts) if parts else np.zeros(0)
+        return times[self._time_mask(times, start, end)]
+
+    @staticmethod
+    def _time_mask(times, start, end):
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times <= end
+        return mask
+
+    def body(self, index, start=None, end=None):
+        """Траектория тела **index** в промежутке времени [start, end].
+        Возвращает массивы t, x, y, Vx, Vy.
+        """
+        if not 0 <= index < self.n:
+            raise ValueError(f"Нет тела с номером {index}")
+        block, row = divmod(index, self.block_size)
+        columns = [[] for _ in range(1 + len(quantities))]
+        with open(self.filename, 'rb') as in_file:
+            for count, t_first, t_last, offsets, lengths in self._selected_chunks(start, end):
+                columns[0].append(delta_decode(self._read_block(in_file, offsets, lengths, 0)))
+                for q in range(len(quantities)):
+                    deltas = self._read_block(in_file, offsets, lengths, 1 + q * self.block_count + block)
+                    columns[q + 1].append(delta_decode(deltas.reshape(-1, count)[row]))
+        columns = [np.concatenate(parts) if parts else np.zeros(0) for parts in columns]
+        mask = self._time_mask(columns[0], start, end)
+        return tuple(column[mask] for column in columns)
+
+    def chunk(self, number):
+        """Все отсчёты куска **number**: массив времён и массив величин формы (4, отсчёты, n)."""
+        count, t_first, t_last, offsets, lengths = self.chunks[number]
+        values = np.empty((len(quantities), count, self.n))
+        with open(self.filename, 'rb') as in_file:
+            times = delta_decode(self._read_block(in_file, offsets, lengths, 0))
+            for q in range(len(quantities)):
+                for block in range(self.block_count):
+                    start = block * self.block_size
+                    deltas = self._read_block(in_file, offsets, lengths, 1 + q * self.block_count + block)
+                    values[q, :, start:start + self.block_size] = delta_decode(deltas.reshape(-1, count)).T
+        return times, values